@@ -1,14 +1,19 @@
+from typing import Optional
 from gym import Env, Wrapper
 from stable_baselines3.common.env_checker import check_env
 
 from nett.body import types
-from nett.body.wrappers.dvs import DVSWrapper
+from nett.body.wrappers.dvs import DVSWrapper, StackedFramesWrapper
 # from nett.body import ascii_art
 
 class Body:
+
+    # where DVS events are computed, True is the same as "env"
+    _DVS_BACKENDS = ("env", "policy")
+
     def __init__(self, type: str = "basic",
                     wrappers: list[Wrapper] = [],
-                    dvs: bool = False) -> None:
+                    dvs: bool | str = False) -> None:
         from nett import logger
         self.logger = logger.getChild(__class__.__name__)
         self.type = self._validate_agent_type(type)
@@ -22,11 +27,19 @@ class Body:
         return type
 
     @staticmethod
-    def _validate_dvs(dvs: bool) -> bool:
-        if not isinstance(dvs, bool):
-            raise TypeError("dvs should be a boolean [True, False]")
+    def _validate_dvs(dvs: bool | str) -> bool | str:
+        if not isinstance(dvs, (bool, str)):
+            raise TypeError(f"dvs should be a boolean [True, False] or one of {Body._DVS_BACKENDS}")
+        if isinstance(dvs, str) and dvs not in Body._DVS_BACKENDS:
+            raise ValueError(f"dvs should be a boolean [True, False] or one of {Body._DVS_BACKENDS}")
         return dvs
 
+    @property
+    def dvs_backend(self) -> Optional[str]:
+        if not self.dvs:
+            return None
+        return "env" if self.dvs is True else self.dvs
+
     @staticmethod
     def _validate_wrappers(wrappers: list[Wrapper]) -> list[Wrapper]:
         for wrapper in wrappers:
@@ -47,9 +60,11 @@ class Body:
 
     def __call__(self, env: Env) -> Env:
         try:
-            # apply DVS wrapper
-            if self.dvs:
+            # apply DVS wrapper, or only stack the frames when the policy computes the events
+            if self.dvs_backend == "env":
                 env = self._wrap(env, DVSWrapper)
+            elif self.dvs_backend == "policy":
+                env = self._wrap(env, StackedFramesWrapper)
             # apply all custom wrappers
             if self.wrappers:
                 for wrapper in self.wrappers:
@@ -1,96 +1,148 @@
 #!/usr/bin/env python3
 
-import collections
 import gym
 import numpy as np
 import cv2
 import logging
+from typing import Optional, Sequence
+
+from nett.body.wrappers.frame_buffer import FrameBufferWrapper
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+
+class DVS:
+    # event frames from consecutive frames of one environment, or of a batch of them,
+    # every frame is blurred once and kept as the previous frame of the next step
+
+    def __init__(self, frame_shape: tuple[int, int, int], change_threshold: int = 60, kernel_size: tuple[int, int] = (3, 3), sigma: float = 1, is_color: bool = True, num_envs: int = 1, channels_first: bool = False) -> None:
+        self.change_threshold = change_threshold
+        self.kernel_size = kernel_size
+        self.sigma = sigma
+        self.is_color = is_color
+        self.num_envs = num_envs
+        # layout of the frames passed in and of the events returned, cv2 works channel-last
+        self.channels_first = channels_first
+
+        height, width, channels = frame_shape[1:] + frame_shape[:1] if channels_first else frame_shape
+        out_channels = channels if is_color else 1
+        self._staging = np.empty((num_envs, height, width, channels), dtype=np.uint8)
+        self._gray = np.empty((height, width, 1), dtype=np.uint8)
+        self._previous = np.empty((num_envs, height, width, out_channels), dtype=np.uint8)
+        self._current = np.empty_like(self._previous)
+        self._change = np.empty(self._previous.shape, dtype=np.int16)
+        self._mask = np.empty(self._previous.shape, dtype=bool)
+        self._events = np.empty_like(self._previous)
+
+    @property
+    def shape(self) -> tuple[int, int, int]:
+        # shape of the events of a single environment
+        height, width, channels = self._events.shape[1:]
+        return (channels, height, width) if self.channels_first else (height, width, channels)
+
+    def reset(self, frames: np.ndarray, indices: Optional[Sequence[int]] = None) -> np.ndarray:
+        # start over from the given frames, nothing has changed yet
+        indices = range(self.num_envs) if indices is None else indices
+        for frame, i in zip(frames, indices):
+            self._blur(frame, self._previous[i])
+            if self.is_color:
+                self._events[i] = 0
+            else:
+                self._events[i] = 128
+        return self._output()
+
+    def step(self, frames: np.ndarray) -> np.ndarray:
+        # frames holds the newest frame of every environment, the returned events are overwritten by the next call
+        for i, frame in enumerate(frames):
+            self._blur(frame, self._current[i])
+        np.subtract(self._current, self._previous, out=self._change, dtype=np.int16)
+        self._threshold()
+        self._previous, self._current = self._current, self._previous
+        return self._output()
+
+    def _blur(self, frame: np.ndarray, out: np.ndarray) -> None:
+        if self.channels_first:
+            frame = frame.transpose(1, 2, 0)
+        if not frame.flags.c_contiguous:
+            np.copyto(self._staging[0], frame)
+            frame = self._staging[0]
+        if not self.is_color:
+            cv2.cvtColor(frame, cv2.COLOR_RGB2GRAY, dst=self._gray)
+            frame = self._gray
+        cv2.GaussianBlur(frame, self.kernel_size, self.sigma, dst=out)
+
+    def _threshold(self) -> None:
+        if self.is_color:
+            # magnitude of the change, below the threshold counts as no change
+            np.abs(self._change, out=self._change)
+            np.greater_equal(self._change, self.change_threshold, out=self._mask)
+            np.multiply(self._change, self._mask, out=self._change)
+            np.copyto(self._events, self._change, casting="unsafe")
+        else:
+            # 255 where it got brighter, 0 where it got darker and 128 elsewhere
+            self._events.fill(128)
+            np.greater_equal(self._change, self.change_threshold, out=self._mask)
+            np.copyto(self._events, 255, where=self._mask)
+            np.less_equal(self._change, -self.change_threshold, out=self._mask)
+            np.copyto(self._events, 0, where=self._mask)
+
+    def _output(self) -> np.ndarray:
+        return self._events.transpose(0, 3, 1, 2) if self.channels_first else self._events
+
+
 class DVSWrapper(gym.ObservationWrapper):
 
 
     def __init__(self, env, change_threshold=60, kernel_size=(3, 3), sigma=1, is_color = True):
         super().__init__(env)
-        
+
         self.change_threshold = change_threshold
         self.kernel_size = kernel_size
         self.sigma = sigma
         self.num_stack = 2 ## default
-        self.env = gym.wrappers.FrameStack(env,self.num_stack)
-        self.stack = collections.deque(maxlen=self.num_stack)
+        self.env = FrameBufferWrapper(env, self.num_stack)
         self.is_color = is_color
-        
+
         try:
-            _, _, width, height = self.env.observation_space.shape # stack, channels,
-            self.shape=(3, width, height)
+            channels, width, height = env.observation_space.shape
+            # reads the newest frame straight from the channel-last buffer
+            self.dvs = DVS((width, height, channels), change_threshold, kernel_size, sigma, is_color)
+            self.shape = (channels if is_color else 1, width, height)
             self.observation_space = gym.spaces.Box(shape=self.shape, low=0, high=255, dtype=np.uint8)
             logger.info("In dvs wrapper")
         except Exception as e:
             raise e
-        
-        
-    def create_grayscale(self, image):
-
-        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-
-    def gaussianDiff(self, previous, current):
-       
-        previous = cv2.GaussianBlur(previous, self.kernel_size, self.sigma)
-        np_previous = np.asarray(previous, dtype=np.int64)
-        
-        current = cv2.GaussianBlur(current, self.kernel_size, self.sigma)
-        np_current = np.asarray(current, dtype=np.int64)
-        
-        change = np_current - np_previous
-        
-        return change
-    
+
     def observation(self, obs):
-     
-        
-        if len(obs)>0:
-            prev = np.transpose(obs[0], (1, 2, 0))
-            current = np.transpose(obs[1], (1, 2, 0))
-            
-            if not self.is_color:
-                prev = cv2.cvtColor(prev, cv2.COLOR_RGB2GRAY)
-                current = cv2.cvtColor(current, cv2.COLOR_RGB2GRAY)
-                
-            change = self.gaussianDiff(prev, current)
-            
-            ## threshold
-            dc = self.threshold(change)
-            
-        else:
-            obs = np.transpose(obs, (1, 2, 0))
-            
-            if not self.is_color:
-                obs = self.create_grayscale(obs)
-            
-            obs = np.array(obs, dtype=np.float32) / 255.0
-            dc = self.threshold(obs)
-        
+        # only the newest frame is new, the previous one is already blurred
+        events = self.dvs.step(self.env.frames.latest[None])[0]
         # change to channel first, w, h
-        dc = np.transpose(dc, (2, 0, 1))
-        
-        return  dc.astype(np.uint8)
+        return np.ascontiguousarray(events.transpose(2, 0, 1))
+
+    def reset(self, **kwargs):
+        self.env.reset(**kwargs)
+        events = self.dvs.reset(self.env.frames.latest[None])[0]
+        return np.ascontiguousarray(events.transpose(2, 0, 1))
+
+
+class StackedFramesWrapper(gym.ObservationWrapper):
+    # the raw frames DVS needs, stacked along the channels with the oldest first,
+    # for when the events are computed by the policy (nett.brain.dvs.DVSExtractor)
+
+    def __init__(self, env, num_stack=2):
+        super().__init__(env)
+
+        self.num_stack = num_stack
+        self.env = FrameBufferWrapper(env, self.num_stack)
+        channels, width, height = env.observation_space.shape
+        self.shape = (self.num_stack * channels, width, height)
+        self.observation_space = gym.spaces.Box(shape=self.shape, low=0, high=255, dtype=np.uint8)
+
+    def observation(self, obs):
+        # (stack, w, h, channels) to (stack * channels, w, h)
+        return np.ascontiguousarray(self.env.frames.stack.transpose(0, 3, 1, 2)).reshape(self.shape)
 
-    def threshold(self, change):
-     
-        if not self.is_color:
-            ret_frame = np.ones(shape=change.shape) * 128
-            ret_frame[change >= self.change_threshold] = 255
-            ret_frame[change <= -self.change_threshold] = 0
-        else:
-            ret_frame = abs(change)
-            ret_frame[ret_frame < self.change_threshold] = 0
-            
-        return ret_frame
-    
     def reset(self, **kwargs):
-        initial_obs = self.env.reset(**kwargs)
-        return self.observation(initial_obs)
+        self.env.reset(**kwargs)
+        return self.observation(None)
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+
+import gym
+import numpy as np
+
+
+class FrameBuffer:
+    # the last `size` frames in a preallocated ring, channel-last,
+    # every frame is written twice so that the stack in order is always one contiguous view
+
+    def __init__(self, size: int, frame_shape: tuple[int, int, int], dtype: np.dtype = np.uint8) -> None:
+        self.size = size
+        self._frames = np.zeros((2 * size,) + tuple(frame_shape), dtype=dtype)
+        # slot of the oldest frame
+        self._start = 0
+
+    @property
+    def stack(self) -> np.ndarray:
+        # (size, height, width, channels), oldest first, valid until the next push
+        return self._frames[self._start:self._start + self.size]
+
+    @property
+    def latest(self) -> np.ndarray:
+        return self._frames[self._start + self.size - 1]
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        # 0 is the oldest frame, -1 the newest
+        return self.stack[index]
+
+    def push(self, frame: np.ndarray, channels_first: bool = False) -> None:
+        # the only copy of the frame, transposed on the way in if needed
+        if channels_first:
+            frame = frame.transpose(1, 2, 0)
+        slot = self._start
+        self._frames[slot] = frame
+        self._frames[slot + self.size] = frame
+        self._start = (slot + 1) % self.size
+
+    def reset(self, frame: np.ndarray, channels_first: bool = False) -> None:
+        # like gym's FrameStack, an episode starts with every slot holding its first frame
+        self.push(frame, channels_first)
+        self._frames[:] = self.latest
+
+
+class FrameBufferWrapper(gym.Wrapper):
+    # keeps the last frames of a channel-first image env in a FrameBuffer, observations pass through unchanged,
+    # later wrappers read them as env.frames
+
+    def __init__(self, env, num_stack=2):
+        super().__init__(env)
+
+        channels, width, height = env.observation_space.shape
+        self.frames = FrameBuffer(num_stack, (width, height, channels), env.observation_space.dtype)
+
+    def step(self, action):
+        obs, reward, done, info = self.env.step(action)
+        self.frames.push(obs, channels_first=True)
+        return obs, reward, done, info
+
+    def reset(self, **kwargs):
+        obs = self.env.reset(**kwargs)
+        self.frames.reset(obs, channels_first=True)
+        return obs
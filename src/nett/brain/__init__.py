@@ -1,29 +1,34 @@
-import ast
-from pathlib import Path
+from importlib import import_module
+from typing import Final
 
-import stable_baselines3
-import sb3_contrib
-from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
+from nett.brain.encoders import ENCODERS
 
-# import encoders
+# the capitalized names exported by stable-baselines3 and sb3-contrib 1.8, listed without importing either package
+SB3_ALGORITHMS: Final[tuple[str, ...]] = ("A2C", "DDPG", "DQN", "HerReplayBuffer", "PPO", "SAC", "TD3")
+SB3_CONTRIB_ALGORITHMS: Final[tuple[str, ...]] = ("ARS", "MaskablePPO", "QRDQN", "RecurrentPPO", "TQC", "TRPO")
 
 def list_encoders() -> list[str]:
-    encoders_dir = Path.joinpath(Path(__file__).resolve().parent, 'encoders')
-    encoders = [encoder.stem for encoder in list(encoders_dir.iterdir()) if "__" not in str(encoder)]
-    return encoders
+    return list(ENCODERS)
 
 encoders_list = list_encoders()
 
+def load_encoder(name: str) -> type:
+    if name not in ENCODERS:
+        raise ValueError(f"If a string, should be one of: {list(ENCODERS)}")
+    return getattr(import_module(f"nett.brain.encoders.{name}"), ENCODERS[name])
+
 def list_algorithms() -> list[str]:
-  
-    sb3_policy_algorithms = [algorithm for algorithm in dir(stable_baselines3) if algorithm[0].isupper()]
-    sb3_contrib_policy_algorithms = [algorithm for algorithm in dir(sb3_contrib) if algorithm[0].isupper()]
-    available_policy_algorithms = sb3_policy_algorithms + sb3_contrib_policy_algorithms
 
-    return available_policy_algorithms
+    return list(SB3_ALGORITHMS + SB3_CONTRIB_ALGORITHMS)
 
 algorithms = list_algorithms()
 
+def load_algorithm(name: str) -> type:
+    if name not in algorithms:
+        raise ValueError(f"If a string, should be one of: {algorithms}")
+    package = "stable_baselines3" if name in SB3_ALGORITHMS else "sb3_contrib"
+    return getattr(import_module(package), name)
+
 # TODO (v0.4) return all available policy models programmatically
 def list_policies() -> list[str]:
 
@@ -32,24 +37,8 @@ def list_policies() -> list[str]:
 policies = list_policies()
 
 # return encoder string to encoder class mapping
-# TODO (v0.4) optimized way to calculate and pass this dict around
 def get_encoder_dict() -> dict[str, str]:
-  
-    encoders_dict: dict[str, str] = {}
-    encoders_dir = Path.joinpath(Path(__file__).resolve().parent, 'encoders')
-    # iterate through all files in the directory
-    for encoder_path in encoders_dir.iterdir():
-        if encoder_path.suffix == '.py' and "__" not in str(encoder_path):
-            module_name = encoder_path.stem
-            # read the source
-            with open(encoder_path) as f:
-                source = f.read()
-            # parse it
-            module = ast.parse(source)
-            # get the first class definition
-            encoder_class = [node for node in ast.walk(module) if isinstance(node, ast.ClassDef)][0]
-            # add to the dictionary
-            encoders_dict[module_name] = encoder_class.name
-    return encoders_dict
+
+    return dict(ENCODERS)
 
 encoder_dict = get_encoder_dict()
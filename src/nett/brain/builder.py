@@ -1,28 +1,30 @@
 import os
+import time
 from typing import Any, Optional
 from pathlib import Path
+from concurrent.futures import Future
 import inspect
 import torch
-import stable_baselines3
-import sb3_contrib
 import numpy as np
-import matplotlib.pyplot as plt
 from tqdm import tqdm
 from stable_baselines3.common.callbacks import CallbackList, CheckpointCallback
-from sb3_contrib import RecurrentPPO
-from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
+from stable_baselines3.common.torch_layers import BaseFeaturesExtractor, FlattenExtractor, NatureCNN
 from stable_baselines3.common.policies import BasePolicy
 from stable_baselines3.common.on_policy_algorithm import OnPolicyAlgorithm
 from stable_baselines3.common.off_policy_algorithm import OffPolicyAlgorithm
-from stable_baselines3.common.env_util import make_vec_env
+from stable_baselines3.common.vec_env import VecEnv, VecMonitor, VecVideoRecorder
 from stable_baselines3.common.env_checker import check_env
 from stable_baselines3.common.monitor import Monitor
 from stable_baselines3.common.logger import configure
-from stable_baselines3.common import results_plotter
-from nett.brain import algorithms, policies, encoder_dict
-from nett.brain import encoders
+from nett.brain import algorithms, policies, load_algorithm, load_encoder
+from nett.brain.dvs import DVSExtractor
+from nett.brain.vec_encoder import VecEncoder
+from nett.brain.encoders.preprocess import freeze
 from nett.utils.callbacks import initialize_callbacks
-from gym.wrappers.monitoring.video_recorder import VideoRecorder
+from nett.utils.callbacks.reward_callback import RewardCallback
+from nett.utils.callbacks.checkpoint_callback import AsyncCheckpointCallback
+from nett.utils.plotting import plot_rewards, submit_plot
+from nett.utils.heartbeat import Heartbeat
 import gym
 from nett.utils.job import Job
 
@@ -42,7 +44,9 @@ class Brain:
         train_encoder: bool = True,
         seed: int = 12,
         custom_encoder_args: dict[str, str]= {},
-        custom_policy_arch: Optional[list[int|dict[str,list[int]]]] = None
+        custom_policy_arch: Optional[list[int|dict[str,list[int]]]] = None,
+        dvs: bool = False,
+        cache_embeddings: bool = False
     ) -> None:
     
        
@@ -62,44 +66,58 @@ class Brain:
         self.seed = seed
         self.custom_encoder_args = custom_encoder_args
         self.custom_policy_arch = custom_policy_arch
+        # compute DVS events in the features extractor, needs a Body with dvs="policy"
+        self.dvs = dvs
+        # encode observations once per step with the frozen encoder, the policy learns from the embeddings
+        self.cache_embeddings = self._validate_cache_embeddings(cache_embeddings, self.encoder, train_encoder)
 
-    def train(self, env: "gym.Env", job: "Job"):
+    def train(self, envs: VecEnv, job: "Job"):
 
+        self._set_num_threads(job)
         # importlib.reload(stable_baselines3)
-        # validate environment
-        env = self._validate_env(env)
-
-        # initialize environment
-        envs = make_vec_env(
-            env_id=lambda: env, 
-            n_envs=1, 
-            # seed=self.seed, # Commented out as seed does not work
-            monitor_dir=str(job.paths["env_logs"])) #TODO: Switch to multi-processing for parallel environments with vec_envs #TODO: Add custom seed function for seeding env, see https://stackoverflow.com/questions/47331235/how-should-openai-environments-gyms-use-env-seed0
+        # record episode statistics across all environment copies
+        #TODO: Add custom seed function for seeding env, see https://stackoverflow.com/questions/47331235/how-should-openai-environments-gyms-use-env-seed0
+        job.paths["env_logs"].mkdir(parents=True, exist_ok=True)
+        envs = VecMonitor(envs, str(job.paths["env_logs"]))
 
         # build model
-        policy_kwargs = {
-            "features_extractor_class": self.encoder,
-            "features_extractor_kwargs": {
-                "features_dim": self.embedding_dim or inspect.signature(self.encoder).parameters["features_dim"].default,
-            }
-        } if self.encoder is not None else {}
-
-        if len(self.custom_encoder_args) > 0:
-            policy_kwargs["features_extractor_kwargs"].update(self.custom_encoder_args)
+        policy_kwargs = self._policy_kwargs()
+        if self.cache_embeddings:
+            envs = self._encode_observations(envs, policy_kwargs, job)
+            # the observations already are the features
+            policy_kwargs = policy_kwargs | {"features_extractor_class": FlattenExtractor, "features_extractor_kwargs": {}}
         
         if self.custom_policy_arch:
             policy_kwargs["net_arch"] = self.custom_policy_arch
             
-        self.logger.info(f'Training with {self.algorithm.__name__}')
+        # n_steps is collected per environment copy, so split the buffer to keep the rollout size unchanged
+        n_steps = max(1, self.buffer_size // envs.num_envs)
+
+        self.logger.info(f'Training with {self.algorithm.__name__} on {envs.num_envs} environment(s)')
+        # when resuming, continue from the newest checkpoint of an interrupted run
+        checkpoint = job.latest_checkpoint() if job.resume and not job.estimate_memory else None
         try:
-            model = self.algorithm(
-                self.policy,
-                envs,
-                batch_size=self.batch_size,
-                n_steps=self.buffer_size,
-                verbose=1,
-                policy_kwargs=policy_kwargs,
-                device=torch.device("cuda", job.device))
+            if checkpoint is not None and checkpoint.suffix == ".zip":
+                # full model saved by older runs
+                self.logger.info(f"Resuming training from checkpoint {checkpoint}")
+                model = self.algorithm.load(
+                    checkpoint,
+                    env=envs,
+                    device=torch.device(job.torch_device))
+                model = AsyncCheckpointCallback.load_replay_buffer(model, checkpoint)
+            else:
+                model = self.algorithm(
+                    self.policy,
+                    envs,
+                    batch_size=self.batch_size,
+                    n_steps=n_steps,
+                    verbose=1,
+                    policy_kwargs=policy_kwargs,
+                    device=torch.device(job.torch_device))
+                if checkpoint is not None:
+                    # policy and optimizer state written by AsyncCheckpointCallback
+                    self.logger.info(f"Resuming training from checkpoint {checkpoint}")
+                    model = AsyncCheckpointCallback.restore(model, checkpoint)
             
         except Exception as e:
             self.logger.exception(f"Failed to initialize model with error: {str(e)}")
@@ -118,14 +136,18 @@ class Brain:
         # initialize callbacks
         self.logger.info("Initializing Callbacks")
         callback_list = initialize_callbacks(job)
+        # keeps the episode rewards for the reward graph, so the monitor logs do not have to be read back
+        reward_callback = RewardCallback()
 
-        # train
-        self.logger.info(f"Total number of training steps: {job.iterations['train']}")
+        # train, a resumed model only runs the steps that are left
+        remaining_steps = job.iterations["train"] - model.num_timesteps
+        self.logger.info(f"Total number of training steps: {job.iterations['train']} ({remaining_steps} remaining)")
         model.learn(
-            total_timesteps=job.iterations["train"],
+            total_timesteps=remaining_steps,
             tb_log_name=self.algorithm.__name__,
+            reset_num_timesteps=checkpoint is None,
             progress_bar=False,
-            callback=[callback_list])
+            callback=[callback_list, reward_callback])
         self.logger.info("Training Complete")
 
         # nothing else is needed for memory estimation
@@ -135,105 +157,131 @@ class Brain:
         # save
         ## create save directory
         job.paths["model"].mkdir(parents=True, exist_ok=True)
-        self.save_encoder_policy_network(model.policy, job.paths["model"])
+        self.save_encoder_policy_network(model.policy, job.paths["model"], envs.encoder if self.cache_embeddings else None)
         print("Saved feature extractor")
         
         save_path = f"{job.paths['model'].joinpath('latest_model.zip')}"
         model.save(save_path)
         self.logger.info(f"Saved model at {save_path}")
 
-        # plot reward graph
-        self.plot_results(iterations=job.iterations["train"],
-                        model_log_dir=job.paths["env_logs"],
+        # plot reward graph in the background, the worker moves on to the next phase
+        self.plot_results(timesteps=list(reward_callback.timesteps),
+                        rewards=list(reward_callback.rewards),
+                        iterations=job.iterations["train"],
                         plots_dir=job.paths["plots"],
-                        name="reward_graph")   
+                        name="reward_graph")
 
-    def test(self, env: "gym.Env", job: "Job"):
+    def test(self, envs: VecEnv, job: "Job"):
    
+        self._set_num_threads(job)
+        if self.cache_embeddings:
+            envs = self._encode_observations(envs, self._policy_kwargs(), job)
         # load previously trained model from save_dir, if it exists
         model: OnPolicyAlgorithm | OffPolicyAlgorithm = self.algorithm.load(
             job.paths['model'].joinpath('latest_model.zip'), 
-            device=torch.device('cuda', job.device))
-
-        # validate environment
-        env = self._validate_env(env)
+            device=torch.device(job.torch_device))
 
-        # initialize environment
-        num_envs = 1
-        envs = make_vec_env(
-            env_id=lambda: env, 
-            n_envs=num_envs, 
-            # seed=self.seed # Commented out as seed does not work
-            )
-        obs = envs.reset() #TODO: try to use envs. This will return a list of obs, rather than a single obs #see https://stable-baselines3.readthedocs.io/en/master/guide/vec_envs.html for details on conversion
-
-        self.logger.info(f'Testing with {self.algorithm.__name__}')
-
-        ## record - test video
+        # frames are only rendered when the test is being recorded
+        if job.record_test:
+            job.paths["env_recs"].mkdir(parents=True, exist_ok=True)
+            envs = VecVideoRecorder(
+                envs,
+                str(job.paths["env_recs"]),
+                record_video_trigger=lambda step: step == 0,
+                video_length=job.iterations["test"] * job.steps_per_episode // envs.num_envs,
+                name_prefix=f"agent_{job.index}")
+
+        # every environment copy runs the same number of whole test cycles
+        num_envs = envs.num_envs
+        iterations: int = job.iterations["test"]
+        episodes_per_env = iterations // num_envs
+
+        self.logger.info(f'Testing with {self.algorithm.__name__} on {num_envs} environment(s)')
+        self.logger.info(f"Total number of episodes: {iterations}")
+        t = tqdm(total=iterations, desc=f"Condition {job.index}", position=job.index)
+        # progress for NETT.status, a healthy test keeps beating while a stalled Unity instance does not
+        heartbeat = Heartbeat(job.heartbeat_path)
+        start = time.time()
         try:
-            # vr = VideoRecorder(env=envs,
-            # path="{}/agent_{}.mp4".format(job.paths["env_recs"], \
-            #     str(index)), enabled=True)
-            
-            # for when algorithm is RecurrentPPO
-            iterations: int = job.iterations["test"]
-            if issubclass(self.algorithm, RecurrentPPO):
-                self.logger.info(f"Total number of episodes: {iterations}")
-                #iterations = 20*50 # 20 episodes of 50 conditions  each
-                t = tqdm(total=iterations, desc=f"Condition {job.index}", position=job.index)
-                for _ in range(iterations):
-                    # cell and hidden state of the LSTM 
-                    done, lstm_states = False, None
-                    # episode start signals are used to reset the lstm states
-                    episode_starts = np.ones((num_envs,), dtype=bool)
-                    episode_length = 0
-                    while not done:
-                        action, lstm_states = model.predict(
-                            obs,
-                            state=lstm_states,
-                            episode_start=episode_starts,
-                            deterministic=True)
-                        obs, _, done, _ = envs.step(action) # obs, rewards, done, info #TODO: try to use envs. This will return a list for each of obs, rewards, done, info rather than single values. Ex: done = [False, False, False, False, False] and not False
-                        t.update(1)
-                        episode_starts = done
-                        episode_length += 1
-                        envs.render(mode="rgb_array") #TODO: try to use envs. This will return a list of obs, rewards, done, info rather than single values
-                        # vr.capture_frame()    
-
-                # vr.close()
-                # vr.enabled = False
-
-            # for all other algorithms
-            else:
-            #iterations = 50*20*200 # 50 conditions of 20 steps each
-                self.logger.info(f"Total number of testing steps: {iterations}")
-                t = tqdm(total=iterations, desc=f"Condition {job.index}", position=job.index)
-                for _ in range(iterations):
-                    action, _ = model.predict(obs, deterministic=True) # action, states
-                    obs, _, done, _ = envs.step(action) # obs, reward, done, info #TODO: try to use envs. This will return a list of obs, rewards, done, info rather than single values
-                    t.update(1)
-                    if done:
-                        envs.reset()
-                    envs.render(mode="rgb_array")
-                    # vr.capture_frame()
+            self._beat_test(heartbeat, 0, iterations, start, force=True)
+            obs = envs.reset()
+            # cell and hidden state of the LSTM, ignored by non-recurrent algorithms
+            lstm_states = None
+            # episode start signals are used to reset the lstm states of each environment copy
+            episode_starts = np.ones((num_envs,), dtype=bool)
+            episode_counts = np.zeros((num_envs,), dtype=int)
+            while (episode_counts < episodes_per_env).any():
+                # one batched forward pass for all environment copies
+                actions, lstm_states = model.predict(
+                    obs,
+                    state=lstm_states,
+                    episode_start=episode_starts,
+                    deterministic=True)
+                # finished environment copies are reset automatically by the VecEnv
+                obs, _, dones, _ = envs.step(actions)
+                episode_starts = dones
+                t.update(int(np.sum(dones & (episode_counts < episodes_per_env))))
+                episode_counts += dones
+                self._beat_test(heartbeat, t.n, iterations, start)
+            self._beat_test(heartbeat, t.n, iterations, start, force=True)
         except Exception as e:
             self.logger.exception(f"Failed to test model with error: {str(e)}")
             raise e
-        # finally:
-            # vr.close()
-            # vr.enabled = False
-        
-        t.close()
+        finally:
+            t.close()
+            # flush the video, the wrapped environments are closed by their owner
+            if isinstance(envs, VecVideoRecorder):
+                envs.close_video_recorder()
     
     @staticmethod
-    def save_encoder_policy_network(policy, path: Path):
+    def _beat_test(heartbeat: Heartbeat, episodes: int, total_episodes: int, start: float, force: bool = False) -> None:
+        # episodes finish too rarely for a recent rate, so the rate is over the whole test
+        elapsed = time.time() - start
+        episodes_per_sec = episodes / elapsed if elapsed > 0 else 0.0
+        heartbeat.beat(
+            force=force,
+            phase="test",
+            episode=episodes,
+            total_episodes=total_episodes,
+            episodes_per_sec=episodes_per_sec,
+            eta=(total_episodes - episodes) / episodes_per_sec if episodes_per_sec > 0 else None)
+
+    def _policy_kwargs(self) -> dict[str, Any]:
+        policy_kwargs = {
+            "features_extractor_class": self.encoder,
+            "features_extractor_kwargs": {
+                "features_dim": self.embedding_dim or inspect.signature(self.encoder).parameters["features_dim"].default,
+            }
+        } if self.encoder is not None else {}
+
+        if len(self.custom_encoder_args) > 0:
+            policy_kwargs["features_extractor_kwargs"].update(self.custom_encoder_args)
+
+        if self.dvs:
+            policy_kwargs = self._dvs_policy_kwargs(policy_kwargs)
+        return policy_kwargs
+
+    @staticmethod
+    def _encode_observations(envs: VecEnv, policy_kwargs: dict[str, Any], job: "Job") -> VecEncoder:
+        encoder = policy_kwargs["features_extractor_class"](envs.observation_space, **policy_kwargs["features_extractor_kwargs"])
+        # train, test and resumed runs have to see the same embeddings, so the first one to build the encoder saves it
+        path = job.paths["model"].joinpath("feature_extractor.pth")
+        if path.exists():
+            encoder.load_state_dict(torch.load(path, map_location="cpu"))
+        elif not job.estimate_memory:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            torch.save(encoder.state_dict(), path)
+        return VecEncoder(envs, encoder, job.torch_device)
+
+    @staticmethod
+    def save_encoder_policy_network(policy, path: Path, features_extractor: Optional[torch.nn.Module] = None):
            
         ## save policy
         path.mkdir(parents=True, exist_ok=True)
         policy.save(os.path.join(path, "policy.pkl"))
         
-        ## save encoder
-        encoder = policy.features_extractor.state_dict()
+        ## save encoder, it is not part of the policy when embeddings are cached
+        encoder = (features_extractor if features_extractor is not None else policy.features_extractor).state_dict()
         save_path = os.path.join(path, "feature_extractor.pth")
         torch.save(encoder, save_path)
 
@@ -241,28 +289,37 @@ class Brain:
 
     @staticmethod
     def plot_results(
+        timesteps: list[int],
+        rewards: list[float],
         iterations: int,
-        model_log_dir: Path,
         plots_dir: Path,
-        name: str
-    ) -> None:
-       
-        results_plotter.plot_results([str(model_log_dir)],
-            iterations,
-            results_plotter.X_TIMESTEPS,
-            name)
-        plots_dir.mkdir(parents=True, exist_ok=True)
-        plt.savefig(plots_dir.joinpath(f"{name}.png"))
-        plt.clf()
+        name: str,
+        wait: bool = False
+    ) -> Future:
+
+        future = submit_plot(plot_rewards, timesteps, rewards, iterations, plots_dir.joinpath(f"{name}.png"), name)
+        if wait:
+            future.result()
+        return future
+
+    @staticmethod
+    def _dvs_policy_kwargs(policy_kwargs: dict[str, Any]) -> dict[str, Any]:
+        # the encoder, SB3's default one if none was given, runs on the events of DVSExtractor
+        encoder = policy_kwargs.get("features_extractor_class", NatureCNN)
+        extractor_kwargs = policy_kwargs.get("features_extractor_kwargs", {
+            "features_dim": inspect.signature(encoder).parameters["features_dim"].default})
+        return policy_kwargs | {
+            "features_extractor_class": DVSExtractor,
+            "features_extractor_kwargs": extractor_kwargs | {"encoder": encoder}
+        }
 
     @staticmethod
     def _validate_encoder(encoder: Any | str) -> BaseFeaturesExtractor:
      
         # for when encoder is a string
         if isinstance(encoder, str):
-            if encoder not in encoder_dict.keys():
-                raise ValueError(f"If a string, should be one of: {encoder_dict.keys()}")
-            encoder = getattr(encoders, encoder_dict[encoder])
+            # only the selected encoder module is imported
+            encoder = load_encoder(encoder)
 
         # for when encoder is a custom PyTorch encoder
         if isinstance(encoder, BaseFeaturesExtractor):
@@ -271,20 +328,19 @@ class Brain:
 
         return encoder
 
+    @staticmethod
+    def _validate_cache_embeddings(cache_embeddings: bool, encoder: Any, train_encoder: bool) -> bool:
+        if cache_embeddings and (encoder is None or train_encoder):
+            raise ValueError("cache_embeddings needs an encoder and train_encoder=False")
+        return cache_embeddings
+
     @staticmethod
     def _validate_algorithm(algorithm: str | OnPolicyAlgorithm | OffPolicyAlgorithm) -> OnPolicyAlgorithm | OffPolicyAlgorithm:
    
         # for when policy is a string
         if isinstance(algorithm, str):
-            if algorithm not in algorithms:
-                raise ValueError(f"If a string, should be one of: {algorithms}")
-            # check for the passed policy in stable_baselines3 as well as sb3-contrib
-            # at this point in the code, it is guaranteed to be in either of the two
-            try:
-                algorithm = getattr(stable_baselines3, algorithm)
-                
-            except:
-                algorithm = getattr(sb3_contrib, algorithm)
+            # look up the passed algorithm in stable_baselines3 or sb3-contrib
+            algorithm = load_algorithm(algorithm)
 
         # for when policy algorithm is custom
         elif isinstance(algorithm, OnPolicyAlgorithm) or isinstance(algorithm, OffPolicyAlgorithm):
@@ -333,13 +389,16 @@ class Brain:
             raise ValueError(f"Failed training env check with {str(ex)}")
         return env
 
+    @staticmethod
+    def _set_num_threads(job: "Job") -> None:
+        # keep concurrent CPU jobs within their share of the cores
+        if job.device_type == "cpu" and job.num_threads:
+            torch.set_num_threads(job.num_threads)
+
     @staticmethod
     def _set_encoder_as_eval(model: OnPolicyAlgorithm | OffPolicyAlgorithm) -> OnPolicyAlgorithm | OffPolicyAlgorithm:
      
-        model.policy.features_extractor.eval()
-
-        for param in model.policy.features_extractor.parameters():
-            param.requires_grad = False
+        freeze(model.policy.features_extractor)
         return model
     
     def __repr__(self) -> str:
@@ -0,0 +1,86 @@
+from typing import Any, Type
+
+import gym
+import torch as th
+from torch import nn
+import torch.nn.functional as F
+from stable_baselines3.common.torch_layers import BaseFeaturesExtractor, NatureCNN
+
+# cv2's RGB to gray weights
+GRAY_WEIGHTS = (0.299, 0.587, 0.114)
+
+
+class DVS(nn.Module):
+    # the events of body.wrappers.dvs.DVS for a batch of stacked frames, computed on the policy's device
+
+    def __init__(self, channels: int, change_threshold: int = 60, kernel_size: tuple[int, int] = (3, 3), sigma: float = 1, is_color: bool = True) -> None:
+        super().__init__()
+        self.channels = channels
+        self.change_threshold = change_threshold
+        self.is_color = is_color
+        self.out_channels = channels if is_color else 1
+
+        # separable like cv2.GaussianBlur, kernel_size is (width, height)
+        kernel = th.outer(_gaussian_kernel(kernel_size[1], sigma), _gaussian_kernel(kernel_size[0], sigma))
+        self.padding = (kernel_size[0] // 2, kernel_size[0] // 2, kernel_size[1] // 2, kernel_size[1] // 2)
+        # derived from the arguments, so it is left out of the saved encoder weights
+        self.register_buffer("kernel", kernel.expand(self.out_channels, 1, *kernel.shape).clone(), persistent=False)
+        self.register_buffer("gray_weights", th.tensor(GRAY_WEIGHTS).view(1, 3, 1, 1), persistent=False)
+
+    def forward(self, frames: th.Tensor) -> th.Tensor:
+        # frames are stacked along the channels, oldest first, and scaled to [0, 1] like any image observation
+        previous = frames[:, -2 * self.channels:-self.channels]
+        current = frames[:, -self.channels:]
+        # both frames are blurred in a single convolution, in the 0-255 range of the env-side wrapper
+        blurred = self._blur(th.cat([previous, current]) * 255)
+        previous, current = blurred.chunk(2)
+        change = current - previous
+
+        if self.is_color:
+            # magnitude of the change, below the threshold counts as no change
+            events = change.abs()
+            events = events * (events >= self.change_threshold)
+        else:
+            # 255 where it got brighter, 0 where it got darker and 128 elsewhere
+            events = th.full_like(change, 128)
+            events = events.masked_fill(change >= self.change_threshold, 255).masked_fill(change <= -self.change_threshold, 0)
+        return events / 255
+
+    def _blur(self, frames: th.Tensor) -> th.Tensor:
+        if not self.is_color:
+            frames = th.round((frames * self.gray_weights).sum(dim=1, keepdim=True))
+        # reflect is cv2's default border, the result is rounded like cv2's uint8 output
+        frames = F.pad(frames, self.padding, mode="reflect")
+        return th.round(F.conv2d(frames, self.kernel, groups=self.out_channels))
+
+
+class DVSExtractor(BaseFeaturesExtractor):
+    # runs DVS on the stacked raw frames and passes the events to any image encoder
+
+    def __init__(self,
+                 observation_space: gym.spaces.Box,
+                 features_dim: int = 256,
+                 encoder: Type[BaseFeaturesExtractor] = NatureCNN,
+                 num_stack: int = 2,
+                 change_threshold: int = 60,
+                 kernel_size: tuple[int, int] = (3, 3),
+                 sigma: float = 1,
+                 is_color: bool = True,
+                 **encoder_kwargs: Any) -> None:
+        super().__init__(observation_space, features_dim)
+        stacked_channels, height, width = observation_space.shape
+        self.dvs = DVS(stacked_channels // num_stack, change_threshold, kernel_size, sigma, is_color)
+        events_space = gym.spaces.Box(low=0, high=255, shape=(self.dvs.out_channels, height, width), dtype=observation_space.dtype)
+        self.encoder = encoder(events_space, features_dim=features_dim, **encoder_kwargs)
+        self._features_dim = self.encoder.features_dim
+
+    def forward(self, observations: th.Tensor) -> th.Tensor:
+        return self.encoder(self.dvs(observations))
+
+
+def _gaussian_kernel(size: int, sigma: float) -> th.Tensor:
+    # same weights as cv2.getGaussianKernel for a positive sigma
+    sigma = sigma if sigma > 0 else 0.3 * ((size - 1) * 0.5 - 1) + 0.8
+    x = th.arange(size, dtype=th.float64) - (size - 1) / 2
+    kernel = th.exp(-x ** 2 / (2 * sigma ** 2))
+    return (kernel / kernel.sum()).float()
@@ -1,8 +1,25 @@
-from .resnet18 import Resnet18CNN
-from .resnet10 import Resnet10CNN
-from .dinov1 import DinoV1
-from .dinov2 import DinoV2
-from .sam import SegmentAnything
-from .vit import ViT
-from .cnnlstm import CNNLSTM
-from .frozensimclr import FrozenSimCLR
+from importlib import import_module
+from typing import Final
+
+# encoder name -> class name, each encoder module (and its timm/torchvision/lightning imports)
+# is only imported once it is used, keep this in sync with the files in this directory
+ENCODERS: Final[dict[str, str]] = {
+    "cnnlstm": "CNNLSTM",
+    "dinov1": "DinoV1",
+    "dinov2": "DinoV2",
+    "frozensimclr": "FrozenSimCLR",
+    "resnet10": "Resnet10CNN",
+    "resnet18": "Resnet18CNN",
+    "sam": "SegmentAnything",
+    "vit": "ViT"
+}
+
+# class name -> module, imported on first access so that importing the package stays cheap
+_ENCODER_MODULES = {class_name: name for name, class_name in ENCODERS.items()}
+
+__all__ = list(_ENCODER_MODULES)
+
+def __getattr__(name: str):
+    if name not in _ENCODER_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(f".{_ENCODER_MODULES[name]}", __name__), name)
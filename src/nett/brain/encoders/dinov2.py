@@ -1,22 +1,22 @@
 import gym
 import torch
 
-from torchvision.transforms import Compose, Resize, CenterCrop, Normalize, InterpolationMode
 from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
+from nett.brain.encoders.preprocess import ImagePreprocess, encode
 
 class DinoV2(BaseFeaturesExtractor):
 
-    def __init__(self, observation_space: gym.spaces.Box, features_dim: int = 384) -> None:
+    def __init__(self, observation_space: gym.spaces.Box, features_dim: int = 384, fold_normalization: bool = True) -> None:
         super(DinoV2, self).__init__(observation_space, features_dim)
         self.n_input_channels = observation_space.shape[0]
-        self.transforms = Compose([Resize(size=256,
-                                          interpolation=InterpolationMode.BICUBIC,
-                                          max_size=None,
-                                          antialias=True),
-                                   CenterCrop(size=(224, 224)),
-                                   Normalize(mean=torch.tensor([0.485, 0.456, 0.406]),
-                                             std=torch.tensor([0.229, 0.224, 0.225]))])
+        # approximately Resize(256, bicubic) + CenterCrop(224) + Normalize(ImageNet), in one interpolation
+        self.transforms = ImagePreprocess(observation_space.shape, resize=256, crop=224)
         self.model = torch.hub.load("facebookresearch/dinov2", "dinov2_vits14", pretrained=True)
+        if fold_normalization:
+            self.transforms.fold_into(self.model.patch_embed.proj)
+        self.model = self.model.to(memory_format=torch.channels_last)
+        # set by freeze() once the encoder is no longer trained
+        self.frozen = False
 
     def forward(self, observations: torch.Tensor) -> torch.Tensor:
-        return self.model(self.transforms(observations))
+        return encode(self.model, self.transforms(observations), self.frozen)
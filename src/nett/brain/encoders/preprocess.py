@@ -0,0 +1,84 @@
+from typing import Sequence
+
+import torch as th
+from torch import nn
+import torch.nn.functional as F
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+class ImagePreprocess(nn.Module):
+    # approximates Resize(resize, bicubic, antialias) + CenterCrop(crop) + Normalize(mean, std) for a known input size
+    # with a single interpolation of the part of the frame that the crop keeps, the crop box is rounded to input pixels
+    # and the bicubic kernel does not reach past it, so the result differs slightly from torchvision at non-integer
+    # scales and along the border
+
+    def __init__(self, input_shape: tuple[int, int, int], resize: int, crop: int = 224, mean: Sequence[float] = IMAGENET_MEAN, std: Sequence[float] = IMAGENET_STD) -> None:
+        super().__init__()
+        _, height, width = input_shape
+        self.box = self._crop_box(height, width, resize, crop)
+        self.size = (crop, crop)
+        self.register_buffer("mean", th.tensor(mean).view(1, -1, 1, 1), persistent=False)
+        self.register_buffer("std", th.tensor(std).view(1, -1, 1, 1), persistent=False)
+        # turned off once the normalization is folded into the model's first convolution
+        self.normalize = True
+
+    def forward(self, observations: th.Tensor) -> th.Tensor:
+        top, left, height, width = self.box
+        observations = observations[..., top:top + height, left:left + width]
+        if (height, width) != self.size:
+            observations = F.interpolate(observations, size=self.size, mode="bicubic", align_corners=False, antialias=True)
+        if self.normalize:
+            observations = (observations - self.mean) / self.std
+        return observations.contiguous(memory_format=th.channels_last)
+
+    def fold_into(self, conv: nn.Conv2d) -> bool:
+        # conv(normalize(x)) == conv'(x) with rescaled weights and a shifted bias, exact only without padding
+        if any(conv.padding) or conv.in_channels != self.mean.shape[1]:
+            return False
+        with th.no_grad():
+            weight = conv.weight / self.std
+            shift = (weight * self.mean).sum(dim=(1, 2, 3))
+            conv.weight.copy_(weight)
+            if conv.bias is None:
+                conv.bias = nn.Parameter(-shift)
+            else:
+                conv.bias.sub_(shift)
+        self.normalize = False
+        return True
+
+    @staticmethod
+    def _crop_box(height: int, width: int, resize: int, crop: int) -> tuple[int, int, int, int]:
+        # like torchvision, the shorter side is resized and the crop is centered in the resized frame,
+        # mapping it back to input pixels rounds the box unless the scale is an integer
+        short, long = min(height, width), max(height, width)
+        new_short, new_long = resize, int(resize * long / short)
+        new_height, new_width = (new_short, new_long) if height <= width else (new_long, new_short)
+        if crop > min(new_height, new_width):
+            raise ValueError(f"Crop of {crop} is larger than the resized frame of {(new_height, new_width)}")
+        top = int(round((new_height - crop) / 2.0))
+        left = int(round((new_width - crop) / 2.0))
+        # the same region in input pixels
+        scale_height, scale_width = height / new_height, width / new_width
+        return (round(top * scale_height), round(left * scale_width),
+                max(1, round(crop * scale_height)), max(1, round(crop * scale_width)))
+
+
+def freeze(module: nn.Module) -> nn.Module:
+    module.eval()
+    for param in module.parameters():
+        param.requires_grad = False
+    # read by encode() on every forward pass, instead of checking every parameter there
+    for submodule in module.modules():
+        if hasattr(submodule, "frozen"):
+            submodule.frozen = True
+    return module
+
+
+def encode(model: nn.Module, observations: th.Tensor, frozen: bool = False) -> th.Tensor:
+    # a frozen model runs in half precision on the GPU, a trained one stays in full precision
+    if frozen and observations.is_cuda:
+        with th.autocast("cuda", dtype=th.float16):
+            return model(observations).float()
+    return model(observations)
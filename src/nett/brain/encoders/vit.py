@@ -2,29 +2,28 @@ import gym
 import torch
 import timm
 
-from torchvision.transforms import Compose
-from torchvision.transforms import Resize, CenterCrop, Normalize, InterpolationMode
 from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
+from nett.brain.encoders.preprocess import ImagePreprocess, encode
 
 class ViT(BaseFeaturesExtractor):
 
-    def __init__(self, observation_space: gym.spaces.Box, features_dim: int = 384) -> None:
+    def __init__(self, observation_space: gym.spaces.Box, features_dim: int = 384, fold_normalization: bool = True) -> None:
 
         super(ViT, self).__init__(observation_space, features_dim)
         self.n_input_channels = observation_space.shape[0]
-        self.transforms = Compose([Resize(size=248,
-                                          interpolation=InterpolationMode.BICUBIC,
-                                          max_size=None,
-                                          antialias=True),
-                                   CenterCrop(size=(224, 224)),
-                                   Normalize(mean=torch.tensor([0.4850, 0.4560, 0.4060]),
-                                             std=torch.tensor([0.2290, 0.2240, 0.2250]))])
+        # approximately Resize(248, bicubic) + CenterCrop(224) + Normalize(ImageNet), in one interpolation
+        self.transforms = ImagePreprocess(observation_space.shape, resize=248, crop=224)
 
         self.model = timm.create_model("vit_small_patch8_224.dino",
                                        in_chans=self.n_input_channels,
                                        num_classes=0,
                                        pretrained=False)
+        if fold_normalization:
+            self.transforms.fold_into(self.model.patch_embed.proj)
+        self.model = self.model.to(memory_format=torch.channels_last)
+        # set by freeze() once the encoder is no longer trained
+        self.frozen = False
 
     def forward(self, observations: torch.Tensor) -> torch.Tensor:
 
-        return self.model(self.transforms(observations))
+        return encode(self.model, self.transforms(observations), self.frozen)
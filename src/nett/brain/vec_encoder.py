@@ -0,0 +1,42 @@
+from typing import Any
+
+import gym
+import numpy as np
+import torch as th
+from stable_baselines3.common.preprocessing import preprocess_obs
+from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
+from stable_baselines3.common.utils import obs_as_tensor
+from stable_baselines3.common.vec_env import VecEnv, VecEnvWrapper
+
+from nett.brain.encoders.preprocess import freeze
+
+
+class VecEncoder(VecEnvWrapper):
+    # replaces the observations of every environment copy with the embeddings of a frozen encoder,
+    # so the encoder runs once per step and the rollout buffer holds vectors instead of images
+
+    def __init__(self, venv: VecEnv, encoder: BaseFeaturesExtractor, device: th.device | str) -> None:
+        self.image_space = venv.observation_space
+        self.device = th.device(device)
+        self.encoder = freeze(encoder.to(self.device))
+        observation_space = gym.spaces.Box(low=-np.inf, high=np.inf, shape=(encoder.features_dim,), dtype=np.float32)
+        super().__init__(venv, observation_space=observation_space)
+
+    def reset(self) -> np.ndarray:
+        return self._encode(self.venv.reset())
+
+    def step_wait(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, list[dict[str, Any]]]:
+        obs, rewards, dones, infos = self.venv.step_wait()
+        # the last observation of a finished episode is used to bootstrap its value, so it is encoded as well
+        finished = [i for i, info in enumerate(infos) if "terminal_observation" in info]
+        if finished:
+            embeddings = self._encode(np.stack([infos[i]["terminal_observation"] for i in finished]))
+            for i, embedding in zip(finished, embeddings):
+                infos[i]["terminal_observation"] = embedding
+        return self._encode(obs), rewards, dones, infos
+
+    @th.no_grad()
+    def _encode(self, obs: np.ndarray) -> np.ndarray:
+        # scaled like the policy would scale the images before its features extractor
+        observations = preprocess_obs(obs_as_tensor(obs, self.device), self.image_space)
+        return self.encoder(observations).float().cpu().numpy()
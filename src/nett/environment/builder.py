@@ -1,33 +1,35 @@
 from __future__ import annotations
 
-import importlib
 import os
-import subprocess
 from typing import Optional, Any
 
 import numpy as np
 # import yaml
 
 from gym import Wrapper
-import mlagents_envs
 from mlagents_envs.environment import UnityEnvironment
 
-# checks to see if ml-agents tmp files have the proper permissions
 from nett import logger
-try :
-    from mlagents_envs.envs.unity_gym_env import UnityToGymWrapper
-except PermissionError as _:
-     raise PermissionError("Directory '/tmp/ml-agents-binaries' is not accessible. Please change permissions of the directory and its subdirectories ('tmp' and 'binaries') to 1777 or delete the entire directory and try again.")
-
+from nett.utils.setup import setup
 from nett.utils.unity_socket import UnitySocket
 
+def _unity_to_gym_wrapper() -> type:
+    # importing it touches /tmp/ml-agents-binaries, which setup() prepares (again, in a fresh worker process)
+    setup()
+    try :
+        from mlagents_envs.envs.unity_gym_env import UnityToGymWrapper
+    except PermissionError as _:
+         raise PermissionError("Directory '/tmp/ml-agents-binaries' is not accessible. Please change permissions of the directory and its subdirectories ('tmp' and 'binaries') to 1777 or delete the entire directory and try again.")
+    return UnityToGymWrapper
+
 class Environment(Wrapper):
     def __init__(self,
                  executable_path: str,
                  display: int = 0,
                  record_chamber: bool = False,
                  record_agent: bool = False,
-                 recording_frames: int = 1000) -> None:
+                 recording_frames: int = 1000,
+                 parquet_logs: bool = False) -> None:
 
         self.logger = logger.getChild(__class__.__name__)
 
@@ -36,11 +38,13 @@ class Environment(Wrapper):
         self.record_agent = record_agent
         self.recording_frames = recording_frames
         self.display = display
+        # also write the Unity logs as Parquet next to the CSV files, requires pyarrow
+        self.parquet_logs = parquet_logs
         # grab the experiment design from the executable directory
         self.num_test_conditions, self.imprinting_conditions = self._get_experiment_design(self.executable_path)
 
-        # set the correct permissions on the executable
-        self._set_executable_permission()
+        # prepare the ml-agents directories and the executable, skipped if done before
+        setup(self.executable_path)
         # set the display for Unity environment
         self._set_display()
 
@@ -49,8 +53,6 @@ class Environment(Wrapper):
     # how can we build + constraint arguments better? something like an ArgumentParser sounds neat
     # TODO (v0.4) fix random_pos logic inside of Unity code
     def initialize(self, mode: str, port: int, **kwargs) -> None:
-        importlib.reload(mlagents_envs)
-
         args = []
 
         # from environment arguments
@@ -83,18 +85,18 @@ class Environment(Wrapper):
             args.extend(["-gpu", str(kwargs["device"])])
 
         # create logger
-        self.log = UnitySocket(f"{kwargs['condition'].replace('-', '_')}{kwargs['brain_id']}-{mode}",
-                          log_dir=f"{kwargs['log_path']}/")
+        self.log_channel = UnitySocket(f"{kwargs['condition'].replace('-', '_')}{kwargs['brain_id']}-{mode}", log_dir=f"{kwargs['log_path']}/", parquet=self.parquet_logs)
 
         # create environment and connect it to logger
-        self.env = UnityEnvironment(self.executable_path, side_channels=[self.log], additional_args=args, base_port=port)
+        UnityToGymWrapper = _unity_to_gym_wrapper()
+        self.env = UnityEnvironment(self.executable_path, side_channels=[self.log_channel], additional_args=args, base_port=port)
         self.env = UnityToGymWrapper(self.env, uint8_visual=True)
 
         # initialize the parent class (gym.Wrapper)
         super().__init__(self.env)
 
     def log(self, msg: str) -> None:
-        self.log.log_str(msg)
+        self.log_channel.log_str(msg)
 
     # converts the (c, w, h) frame returned by mlagents v1.0.0 and Unity 2022.3 to (w, h, c)
     # as expected by gym==0.21.0
@@ -110,9 +112,12 @@ class Environment(Wrapper):
         next_state, reward, done, info = self.env.step(action)
         return next_state, float(reward), done, info
 
-    def _set_executable_permission(self) -> None:
-        subprocess.run(["chmod", "-R", "755", self.executable_path], check=True)
-        self.logger.info("Executable permission is set")
+    def close(self) -> None:
+        try:
+            self.env.close()
+        finally:
+            # flush the buffered logs once Unity has sent its last messages
+            self.log_channel.close()
 
     def _set_display(self) -> None:
         os.environ["DISPLAY"] = str(f":{self.display}")
@@ -1,12 +1,14 @@
-import subprocess
-import time
+import json
 import shutil
 from pathlib import Path
 from typing import (
     Any,
+    Iterator,
     Optional
 )
 from copy import deepcopy
+from contextlib import contextmanager
+from functools import partial
 from itertools import product
 from concurrent.futures import (
     ProcessPoolExecutor,
@@ -16,18 +18,17 @@ from concurrent.futures import (
 )
 
 import pandas as pd
-from sb3_contrib import RecurrentPPO
-from pynvml import (
-    nvmlInit,
-    nvmlDeviceGetCount,
-    nvmlDeviceGetHandleByIndex,
-    nvmlDeviceGetMemoryInfo
-)
+from stable_baselines3.common.vec_env import VecEnv, DummyVecEnv, SubprocVecEnv
 
 from utils.io import mute
 from nett.utils.job import Job
 from nett.utils.side_channel_logger import Logger
-from nett.utils.unity_socket import port_in_use
+from nett.utils.scheduler import Scheduler, MemoryProbe, NvmlProbe, CpuProbe
+from nett.utils.memory_cache import JobMemoryCache
+from nett.utils.ledger import Ledger
+from nett.utils.heartbeat import Heartbeat
+from nett.utils.live_analyzer import LiveAnalyzer
+from nett.utils.port_allocator import PortAllocator
 from utils.analyze import analyze
 from brain.builder import Brain
 from body.builder import Body
@@ -41,16 +42,20 @@ class NETT:
             self,
             brain: Brain,
             body: Body,
-            environment: Environment
+            environment: Environment,
+            memory_probe: Optional[MemoryProbe] = None
         ):
       
         logger = Logger()
         self.logger = logger.getChild(__class__.__name__)
         self.brain = brain
         self.body = body
+        self._validate_dvs(brain, body)
         self.environment = environment        
-        # for NVIDIA memory management
-        nvmlInit()
+        # for memory management, defaults to NVML or host memory depending on the device type of the run
+        self.memory_probe: Optional[MemoryProbe] = memory_probe
+        self.scheduler: Optional[Scheduler] = None
+        self.analyzer: Optional[LiveAnalyzer] = None
 
     def run(self,
             output_dir: Path | str,
@@ -68,7 +73,14 @@ class NETT:
             synchronous: bool = False,
             save_checkpoints: bool = False,
             checkpoint_freq: int = 30_000,
-            base_port: int = 5004
+            base_port: int = 5004,
+            num_envs: int = 1,
+            record_test: bool = False,
+            device_type: str = "cuda",
+            resume: bool = False,
+            live_analysis: bool = False,
+            analysis_config: Optional[str] = None,
+            keep_checkpoints: Optional[int] = 3
         ) -> list[Future]:
     
         # set up the output_dir (wherever the user specifies, REQUIRED, NO DEFAULT)
@@ -76,26 +88,51 @@ class NETT:
         output_dir.mkdir(parents=True, exist_ok=True)
         self.logger.info(f"Set up run directory at: {output_dir.resolve()}")
 
+        if num_envs < 1:
+            raise ValueError(f"num_envs should be a positive integer, got {num_envs}")
+
         # calculate iterations
         iterations: dict[str, int] = {}
         if mode in ["train", "full"]:
             iterations["train"] = steps_per_episode * train_eps
+            # every call to env.step() advances all environment copies, so round up to a multiple of num_envs
+            iterations["train"] = -(-iterations["train"] // num_envs) * num_envs
         if mode in ["test", "full"]:
+            # counted in episodes, each of the test_eps cycles visits every test condition once
             iterations["test"] = test_eps * self.environment.num_test_conditions
-            if not issubclass(self.brain.algorithm, RecurrentPPO):
-                iterations["test"] *= steps_per_episode
+
+        # on CPU, devices are worker slots bounded by the cores and host memory
+        probe: MemoryProbe = self.memory_probe or self._default_probe(device_type, devices)
 
         # initialize job object ## TODO: determin WHY HERE?
-        Job.initialize(mode, output_dir, save_checkpoints, steps_per_episode, checkpoint_freq, self.brain.reward, batch_mode, iterations)
+        Job.initialize(
+            mode=mode,
+            output_dir=output_dir,
+            steps_per_episode=steps_per_episode,
+            save_checkpoints=save_checkpoints,
+            checkpoint_freq=checkpoint_freq,
+            keep_checkpoints=keep_checkpoints,
+            reward=self.brain.reward,
+            batch_mode=batch_mode,
+            iterations=iterations,
+            num_envs=num_envs,
+            num_test_conditions=self.environment.num_test_conditions,
+            record_test=record_test,
+            device_type=device_type,
+            num_threads=probe.threads_per_slot if isinstance(probe, CpuProbe) else None,
+            resume=resume)
 
         # validate devices
-        devices = self._validate_devices(devices)
-        self.logger.info(f"Devices that will be used: {devices}")
+        devices = self._validate_devices(devices, probe)
+        self.logger.info(f"Devices that will be used: {device_type} {devices}")
 
         # estimate memory for a single job
+        memory_profile: Optional[dict[str, int | str]] = None
         if job_memory == "auto":
             self.logger.info("Estimating Job Memory...")
-            job_memory = int(buffer * self._estimate_job_memory(devices, base_port))
+            memory_profile = self._estimate_job_memory(devices, base_port, probe)
+            self.logger.info(f"Job memory profile (bytes): {memory_profile}")
+            job_memory = int(buffer * memory_profile["peak"])
             self.logger.info(f"Estimated Job Memory: {job_memory / (1024**3)} GiB")
         else:
             job_memory *= buffer * 1024 * 1024 * 1024 # set memory to be in GiB
@@ -103,30 +140,53 @@ class NETT:
 
         # get task set
         task_set: set[tuple[str,int]] = self._get_task_set(num_brains, self.environment.imprinting_conditions, conditions)
+
+        # skip the phases that an earlier run on the same output_dir already completed
+        ledger = Ledger(output_dir)
+        completed: dict[tuple[str,int], set[str]] = ledger.completed() if resume else {}
+        if resume:
+            phases: set[str] = {"train", "test"} if mode == "full" else {mode}
+            task_set = ledger.remaining(task_set, phases)
+            self.logger.info(f"Resuming, {len(task_set)} tasks left to run")
         
         # schedule jobs
-        jobs, waitlist = self._schedule_jobs(task_set, devices, job_memory, base_port, self.logger)
+        self.scheduler = self._schedule_jobs(task_set, devices, job_memory, base_port, probe, memory_profile, completed)
         self.logger.info("Scheduled jobs")
 
+        # score the env logs while jobs write them, and run the full analysis once the last job finishes
+        if live_analysis:
+            self.analyzer = LiveAnalyzer(output_dir, self.scheduler, config=analysis_config)
+            self.analyzer.start()
+
         # launch jobs
         self.logger.info("Launching")
-        job_sheet = self._launch_jobs(jobs, synchronous, waitlist, verbose)
+        job_sheet = self._launch_jobs(self.scheduler, synchronous, verbose)
 
         # return control back to the user after launching jobs, do not block
         return job_sheet
 
-    def status(self, job_sheet: dict[Future, Job]) -> pd.DataFrame:
-     
+    def status(self, job_sheet: Optional[dict[Future, Job]] = None) -> pd.DataFrame:
+        # defaults to every job of the latest run, including the ones still waiting for a device
+        if job_sheet is None:
+            job_sheet = self.scheduler.job_sheet if self.scheduler is not None else {}
+        queued = list(self.scheduler.queue) if self.scheduler is not None else []
+        scheduler_error = self.scheduler.error if self.scheduler is not None else None
+
         selected_columns = ["brain_id", "condition", "device"]
-        filtered_job_sheet = self._filter_job_sheet(job_sheet, selected_columns)
+        filtered_job_sheet = self._filter_job_sheet(job_sheet, selected_columns, queued, scheduler_error)
         return pd.json_normalize(filtered_job_sheet)
 
-    # TODO v0.3, make .analyze() a staticmethod so that it does not need a class instance to call
-    # TODO v0.3. add support for user specified output_dir
+    def live_scores(self) -> pd.DataFrame:
+        # imprinting scores of the running sweep, requires run(live_analysis=True)
+        if self.analyzer is None:
+            raise ValueError("Live analysis is not running, start the run with live_analysis=True")
+        return self.analyzer.update()
+
     # Discussion v0.3 is print okay or should we have it log using nett's logger?
     # Discussion v0.3 move this out of the class entirely? from nett import analyze, analyze(...)
 
     # TODO: find place to insert call for analyze()
+    @staticmethod
     def analyze(
             config: str,
                     run_dir: str | Path,
@@ -134,103 +194,75 @@ class NETT:
                     ep_bucket: int = 100,
                     num_episodes: int = 1000,
                     bar_order: str | list[int] = "default",
-                    color_bars: bool = True) -> None:
-    
-            # TODO may need to clean up this file structure
-            # set paths
-            run_dir = Path(run_dir).resolve()
-            if not run_dir.exists():
-                raise FileNotFoundError(f"Run directory {run_dir} does not exist.")
-
-            analysis_dir = Path(__file__).resolve().parent.joinpath("analysis")
-            if output_dir is None:
-                output_dir = run_dir.joinpath("results")
-            output_dir = Path(output_dir).resolve()
-            output_dir.mkdir(parents=True, exist_ok=True)
-
-            chick_data_dir = Path(analysis_dir).joinpath("ChickData", f"{config.lower()}.csv")
-
-            if not chick_data_dir.exists():
-                raise ValueError(f"'{config}' is not a valid config.")
-            elif not run_dir.exists():
-                raise ValueError(f"'{run_dir}' is not a valid run directory.")
-            elif not analysis_dir.exists():
-                raise ValueError(f"'{analysis_dir}' is not a valid analysis directory. This is likely an error in the package.")
-
-            # translate bar_order for R to read
-            bar_order_str = str(bar_order).translate({ord(i): None for i in ' []'}) # remove spaces and brackets from bar_order
-
-            # merge
-            print("Running merge")
-            subprocess.run(["Rscript", str(analysis_dir.joinpath("NETT_merge_csvs.R")),
-                            "--logs-dir", str(run_dir),
-                            "--results-dir", str(output_dir),
-                            "--results-name", "analysis_data",
-                            "--csv-train", "train_results.csv",
-                            "--csv-test", "test_results.csv"], check=True)
-
-            # train
-            print("Running analysis for [train]")
-            subprocess.run(["Rscript", str(analysis_dir.joinpath("NETT_train_viz.R")),
-                            "--data-loc", str(output_dir.joinpath("analysis_data")),
-                            "--results-wd", str(output_dir),
-                            "--ep-bucket", str(ep_bucket),
-                            "--num-episodes", str(num_episodes)], check=True)
-
-            # test
-            print("Running analysis for [test]")
-            subprocess.run(["Rscript", str(analysis_dir.joinpath("NETT_test_viz.R")),
-                            "--data-loc", str(output_dir.joinpath("analysis_data")),
-                            "--results-wd", str(output_dir),
-                            "--bar-order", bar_order_str,
-                            "--color-bars", str(color_bars),
-                            "--chick-file", str(chick_data_dir)], check=True)
-
-            print(f"Analysis complete. See results at {output_dir}")
+                    color_bars: bool = True,
+                    max_workers: Optional[int] = None) -> None:
+            # the analysis lives in nett.utils.analyze, this only keeps NETT.analyze() working
+            analyze(config, run_dir, output_dir, ep_bucket, num_episodes, bar_order, color_bars, max_workers)
 
     def _execute_job(self, job: Job) -> Future:
         brain: Brain = deepcopy(self.brain)
+        # nothing is recorded for memory estimation
+        ledger = Ledger(job.output_dir) if not job.estimate_memory else None
 
         # for train
-        if job.estimate_memory or job.mode in ["train", "full"]: # TODO: Create a memory estimate method for test
-            try:
-                # initialize environment with necessary arguments
-                with self._wrap_env("train", job.port, job.env_kwargs()) as train_environment:
-                    brain.train(train_environment, job)
-            except Exception as e:
-                self.logger.exception(f"Error in training: {e}")
-                raise e
-
-        # for test
-        if job.mode in ["test", "full"]:
-            try:
-                # initialize environment with necessary arguments
-                with self._wrap_env("test", job.port, job.env_kwargs()) as test_environment:
-                    brain.test(test_environment, job)
-
-                    # if job.estimate_memory:                 
-                    #     with open(job.paths["base"] / "mem.txt", "w") as file:
-                    #         file.write(str(nvmlDeviceGetMemoryInfo(nvmlDeviceGetHandleByIndex(job.device)).used))
-            except Exception as e:
-                self.logger.exception(f"Error in testing: {e}")
-                raise e
+        if job.estimate_memory or "train" in job.phases: # TODO: Create a memory estimate method for test
+            with self._record_phase(ledger, job, "train"):
+                # initialize one environment copy per port
+                train_environments = self._make_vec_env("train", job)
+                try:
+                    brain.train(train_environments, job)
+                finally:
+                    train_environments.close()
+
+        # for test, nothing is needed for memory estimation
+        if "test" in job.phases and not job.estimate_memory:
+            with self._record_phase(ledger, job, "test"):
+                # initialize as many environment copies as can split the test cycles evenly
+                test_environments = self._make_vec_env("test", job, job.num_test_envs)
+                try:
+                    brain.test(test_environments, job)
+                finally:
+                    test_environments.close()
 
         return f"Job Completed Successfully for Brain #{job.brain_id} with Condition: {job.condition}"
 
-    def _estimate_job_memory(self, devices: list[int], base_port: int) -> int:
+    @contextmanager
+    def _record_phase(self, ledger: Optional[Ledger], job: Job, phase: str) -> Iterator[None]:
+        # keep the ledger in step with the phase so that interrupted runs can be resumed
+        if ledger is not None:
+            ledger.record(job, phase, "started")
+        try:
+            yield
+        except Exception as e:
+            self.logger.exception(f"Error in {phase}ing: {e}")
+            if ledger is not None:
+                ledger.record(job, phase, "failed", error=repr(e))
+            raise e
+        if ledger is not None:
+            ledger.record(job, phase, "completed")
+
+    def _estimate_job_memory(self, devices: list[int], base_port: int, probe: MemoryProbe) -> dict[str, int | str]:
+        # reuse the footprint measured for the same configuration in an earlier run
+        cache = JobMemoryCache()
+        config = self._job_memory_config()
+        cached_profile = cache.get(config)
+        if cached_profile is not None:
+            self.logger.info(f"Using cached memory estimate from {cache.path}")
+            return cached_profile
+
         self.logger.info("Estimating memory for a single job")
+        # reserve a block of unused ports
+        port_allocator = PortAllocator(base_port)
+        ports = port_allocator.reserve(Job.num_envs)
+        job: Optional[Job] = None
         try:
             # create a temporary directory to hold memory estimate during runtime
             tmp_path = Path("./.tmp/").resolve()
             tmp_path.mkdir(parents=True, exist_ok=True)
 
-            # find the GPU with the most free memory
-            free_memory = [nvmlDeviceGetMemoryInfo(nvmlDeviceGetHandleByIndex(device)).free for device in devices]
-            most_free_gpu = free_memory.index(max(free_memory))
-
-            # find unused port
-            while port_in_use(base_port):
-                base_port += 1
+            # find the device with the most free memory
+            free_memory = [probe.memory(device).free for device in devices]
+            most_free_gpu = devices[free_memory.index(max(free_memory))]
 
             # create a test job to estimate memory
             job = Job(
@@ -238,16 +270,13 @@ class NETT:
                 condition=self.environment.imprinting_conditions[0], 
                 device=most_free_gpu, 
                 index=0,
-                port=base_port,
+                port=ports[0],
                 estimate_memory=True)
 
             job.save_checkpoints = False
 
-            # change initial port for next job
-            base_port += 1
-
-            # calculate current memory usage for baseline for comparison
-            pre_memory = nvmlDeviceGetMemoryInfo(nvmlDeviceGetHandleByIndex(job.device)).used
+            # calculate current memory usage for baseline, in case usage can only be measured for the whole device
+            pre_memory = probe.memory(job.device).used
 
             # initializer = mute if not verbose else None
             # executor = ProcessPoolExecutor(max_workers=max_workers, initializer=initializer)
@@ -260,71 +289,98 @@ class NETT:
 
             future_wait(job_sheet, return_when=FIRST_COMPLETED)
 
-            with open(Path.joinpath(job.paths["base"], "mem.txt").resolve(), "r") as file:
-                post_memory = int(file.readline())
+            with open(Path.joinpath(job.paths["base"], "mem.json").resolve(), "r") as file:
+                profile = json.load(file)
         except Exception as e:
             self.logger.exception(f"Error in estimating memory: {e}")
             raise e
         finally:
-            if job.paths["base"].exists():
+            port_allocator.release(ports)
+            if job is not None and job.paths["base"].exists():
                 shutil.rmtree(job.paths["base"])
         
-        # estimate memory allocated
-        return post_memory - pre_memory
+        # estimate memory allocated, per-process measurements already exclude other processes
+        if profile["source"] == "device":
+            profile["peak"] -= pre_memory
+        cache.set(config, profile)
+        return profile
+
+    def _job_memory_config(self) -> dict[str, Any]:
+        # everything that changes the footprint of a job, the executable and body determine the observation shape
+        name = lambda obj: obj if obj is None or isinstance(obj, str) else f"{obj.__module__}.{obj.__qualname__}"
+        executable = Path(self.environment.executable_path).resolve()
+        return {
+            "encoder": name(self.brain.encoder),
+            "policy": name(self.brain.policy),
+            "algorithm": name(self.brain.algorithm),
+            "embedding_dim": self.brain.embedding_dim,
+            "train_encoder": self.brain.train_encoder,
+            "cache_embeddings": self.brain.cache_embeddings,
+            "custom_encoder_args": self.brain.custom_encoder_args,
+            "custom_policy_arch": self.brain.custom_policy_arch,
+            "batch_size": self.brain.batch_size,
+            "buffer_size": self.brain.buffer_size,
+            "executable": str(executable),
+            "executable_mtime": executable.stat().st_mtime,
+            "dvs": self.body.dvs,
+            "wrappers": [name(wrapper) for wrapper in self.body.wrappers],
+            "device_type": Job.device_type,
+            "num_envs": Job.num_envs
+        }
 
     @staticmethod
-    def _filter_job_sheet(job_sheet: dict[Future, dict[str,Any]], selected_columns: list[str]) -> list[dict[str,bool|str]]:
-        # TODO include waitlisted jobs
-        runStatus = lambda job_future: {'running': job_future.running()}
-        jobInfo = lambda job: {k: getattr(job, k) for k in selected_columns}
-
-        return [runStatus(job_future) | jobInfo(job) for job_future, job in job_sheet.items()]
+    def _filter_job_sheet(job_sheet: dict[Future, Job], selected_columns: list[str], queued: Optional[list[Job]] = None, scheduler_error: Optional[BaseException] = None) -> list[dict[str, Any]]:
+        jobs = [(None, job) for job in queued or []] + list(job_sheet.items())
+        # the last error of every phase, including the ones recorded by earlier runs
+        ledger = Ledger(Job.output_dir).latest() if jobs else {}
+
+        rows = []
+        for job_future, job in jobs:
+            state = NETT._job_state(job_future)
+            heartbeat = Heartbeat.read(job.heartbeat_path) if state != "queued" else None
+            heartbeat = heartbeat or {}
+            errors = [entry for (condition, brain_id, _), entry in ledger.items() if (condition, brain_id) == (job.condition, job.brain_id) and entry["state"] == "failed"]
+            last_error = max(errors, key=lambda entry: entry["time"]).get("error") if errors else None
+            if state == "failed":
+                last_error = "cancelled" if job_future.cancelled() else repr(job_future.exception())
+            elif state == "queued" and scheduler_error is not None:
+                # the scheduler stopped, so the job will never be launched
+                state, last_error = "failed", f"not launched: {scheduler_error!r}"
+            rows.append({
+                "state": state,
+                "running": state == "running",
+                **{k: getattr(job, k) for k in selected_columns},
+                "phase": heartbeat.get("phase"),
+                "timestep": heartbeat.get("timestep"),
+                "total_timesteps": heartbeat.get("total_timesteps"),
+                "steps_per_sec": heartbeat.get("steps_per_sec"),
+                "episode": heartbeat.get("episode"),
+                "total_episodes": heartbeat.get("total_episodes"),
+                "episodes_per_sec": heartbeat.get("episodes_per_sec"),
+                "eta": heartbeat.get("eta"),
+                "gpu_memory": heartbeat.get("gpu_memory"),
+                # seconds since the job last reported progress, a stalled Unity instance keeps growing it
+                "heartbeat_age": heartbeat.get("age"),
+                "last_error": last_error
+            })
+        return rows
 
     @staticmethod
-    def _get_memory_status(devices: list[int]) -> dict[int, dict[str, int]]:
-        unpack = lambda memory_status: {"free": memory_status.free, "used": memory_status.used, "total": memory_status.total}
-        memory_status = {
-            device_id : unpack(nvmlDeviceGetMemoryInfo(nvmlDeviceGetHandleByIndex(device_id))) 
-            for device_id in devices
-        }
-        return memory_status
-    
-    def _launch_jobs(self, jobs: list[Job], wait: bool, waitlist: list[Job], verbose: bool) -> dict[Future, Job]:
-     
-        try:
-            max_workers = 1 if len(jobs) == 1 else None
-            initializer = mute if not verbose else None
-            executor = ProcessPoolExecutor(max_workers=max_workers, initializer=initializer)
-            job_sheet: dict[Future, dict[str, Job]] = {}
-
-            for job in jobs:
-                job_future = executor.submit(self._execute_job, job)
-                job_sheet[job_future] = job
-                time.sleep(1)
-
-            while waitlist:
-                done, _ = future_wait(job_sheet, return_when=FIRST_COMPLETED)
-                for doneFuture in done:
-                    doneJob: Job = job_sheet.pop(doneFuture)
-                    freeDevice: int = doneJob.device
-                    freePort: int = doneJob.port
-                    job = waitlist.pop()
-                    job.device = freeDevice
-                    job.port = freePort
-                    job_future = executor.submit(self._execute_job, job)
-                    job_sheet[job_future] = job
-                    time.sleep(1)
-
-            if wait:
-                while job_sheet:
-                    done, _ = future_wait(job_sheet, return_when=FIRST_COMPLETED)
-                    for doneFuture in done:
-                        job_sheet.pop(doneFuture)
-                    time.sleep(1)
-
-            return job_sheet
-        except Exception as e:
-            print(str(e))
+    def _job_state(job_future: Optional[Future]) -> str:
+        # jobs without a future are still waiting for a device
+        if job_future is None or not (job_future.running() or job_future.done()):
+            return "queued"
+        if job_future.running():
+            return "running"
+        if job_future.cancelled() or job_future.exception() is not None:
+            return "failed"
+        return "done"
+
+    def _launch_jobs(self, scheduler: Scheduler, wait: bool, verbose: bool) -> dict[Future, Job]:
+        initializer = mute if not verbose else None
+        executor = ProcessPoolExecutor(max_workers=None, initializer=initializer)
+        # the scheduler keeps backfilling queued jobs as devices free up, blocking only if asked to wait
+        return scheduler.launch(executor, self._execute_job, wait)
 
     @staticmethod
     def _get_task_set(num_brains: int, all_conditions: list[str], conditions: Optional[list[str]]) -> set[tuple[str,int]]: #TODO: Create a better name for this method
@@ -345,67 +401,35 @@ class NETT:
         # create set of all brain-environment combinations
         return set(product(condition_set, set(range(1, num_brains + 1))))
 
-    def _schedule_jobs(self, task_set: set[tuple[str,int]], devices: list[int], job_memory: int, port: int, logger: Logger) -> tuple[list[Job], list[Job]]:
-        # create jobs
-        jobs: list[Job] = []
-        waitlist: list[Job] = []
-
-        # assign devices based on memory availability
-        # get the list of devices
-        free_devices: list[int] = devices.copy()
-
-        # get the free memory status for each device
-        free_device_memory: dict[int, int] = {device: memory_status["free"] for device, memory_status in self._get_memory_status(devices).items()}
-
-        while task_set:
-            # if there are no free devices, add jobs to the waitlist
-            if not free_devices:
-                if not jobs:
-                    raise ValueError("No jobs could be scheduled. Job size too large for GPUs. If job_memory='auto', consider setting buffer to 1. Otherwise, consider setting job_memory to a value less than or equal to total free GPU memory / buffer.")
-                logger.info("No free devices. Jobs will be queued until a device is available.")
-                waitlist = [
-                    Job(brain_id, condition, device=-1, index=len(jobs)+i, port=-1) 
-                    for i, (condition, brain_id) in enumerate(task_set)
-                ]
-                logger.warning("Insufficient GPU Memory. Jobs will be queued until memory is available. This may take a while.")
-                break
-
-            # remove devices that don't have enough memory
-            if free_device_memory[free_devices[-1]] < job_memory:
-                logger.info(f"Device {free_devices[-1]} does not have enough memory. Removing from list of available devices.")
-                free_devices.pop()
-            # assign device to job
-            else:
-                logger.info(f"Assigning device {free_devices[-1]} to job")
-                # create job
-                condition, brain_id = task_set.pop()
-
-                # find unused port
-                while port_in_use(port):
-                    port += 1
-
-                job = Job(
-                    brain_id=brain_id, 
-                    condition=condition, 
-                    device=free_devices[-1], 
-                    index=len(jobs),
-                    port=port)
-                jobs.append(job)
-
-                # change initial port for next job
-                port += 1
-
-                # allocate memory
-                free_device_memory[free_devices[-1]] -= job_memory
-                # rotate devices
-                free_devices = [free_devices[-1]] + free_devices[:-1]
-
-        return jobs, waitlist
+    def _schedule_jobs(self, task_set: set[tuple[str,int]], devices: list[int], job_memory: int, port: int, probe: MemoryProbe, memory_profile: Optional[dict[str, int | str]] = None, completed: Optional[dict[tuple[str,int], set[str]]] = None) -> Scheduler:
+        # devices and ports are assigned by the scheduler when a job is launched
+        completed = completed or {}
+        jobs: list[Job] = [
+            Job(brain_id=brain_id, condition=condition, device=-1, index=index, port=-1,
+                completed_phases=completed.get((condition, brain_id)))
+            for index, (condition, brain_id) in enumerate(task_set)
+        ]
+        scheduler = Scheduler(devices, job_memory, probe, port, memory_profile=memory_profile)
+        scheduler.submit(jobs)
+        return scheduler
+
+    @staticmethod
+    def _validate_dvs(brain: Brain, body: Body) -> None:
+        # with dvs="policy" the body only stacks the frames and the brain computes the events
+        if brain.dvs != (body.dvs_backend == "policy"):
+            raise ValueError("Brain(dvs=True) and Body(dvs=\"policy\") have to be used together")
 
     @staticmethod
-    def _validate_devices(devices: Optional[list[int]]) -> list[int]:
+    def _default_probe(device_type: str, devices: Optional[list[int]]) -> MemoryProbe:
+        if device_type == "cpu":
+            # custom device lists choose how many worker slots share the host
+            return CpuProbe(num_slots=max(devices) + 1 if devices else None)
+        return NvmlProbe()
+
+    @staticmethod
+    def _validate_devices(devices: Optional[list[int]], probe: MemoryProbe) -> list[int]:
         # check if the devices are available and return the list of devices to be used
-        available_devices: list[int] = list(range(nvmlDeviceGetCount()))
+        available_devices: list[int] = list(range(probe.device_count()))
 
         if devices is None:
             devices = available_devices
@@ -414,6 +438,27 @@ class NETT:
 
         return devices
 
+    def _make_vec_env(self, mode: str, job: Job, num_envs: Optional[int] = None) -> VecEnv:
+        # one factory per environment copy, each bound to its own port and log directory
+        env_fns = [
+            partial(self._make_env, mode, port, job.env_kwargs(rank))
+            for rank, port in enumerate(job.ports[:num_envs])
+        ]
+        # a single copy stays in-process, multiple copies each get their own worker process
+        if len(env_fns) == 1:
+            return DummyVecEnv(env_fns)
+        return SubprocVecEnv(env_fns)
+
+    def _make_env(self, mode: str, port: int, kwargs: dict[str,Any]) -> "gym.Env":
+        return Brain._validate_env(self._wrap_env(mode, port, kwargs))
+
+    def __getstate__(self) -> dict[str, Any]:
+        # the scheduler and analyzer live in the launching process only, workers receive everything else
+        state = self.__dict__.copy()
+        state["scheduler"] = None
+        state["analyzer"] = None
+        return state
+
     def _wrap_env(self, mode: str, port: int, kwargs: dict[str,Any]) -> Body:
         copy_environment = deepcopy(self.environment)
         copy_environment.initialize(mode, port, **kwargs)
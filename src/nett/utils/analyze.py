@@ -1,9 +1,21 @@
-import subprocess
 from pathlib import Path
 from typing import Optional
 
-# TODO: make this callable without needing to specify params 
-# and run automatically when nett.run() completes
+import numpy as np
+import pandas as pd
+from matplotlib.axes import Axes
+# explicit Figures render with Agg and are safe to draw from the live analyzer's thread
+from matplotlib.figure import Figure
+from matplotlib.ticker import PercentFormatter
+from scipy import stats
+
+from nett.utils.dataset import LogDataset
+
+# TODO: make this callable without needing to specify params
+# runs automatically when the last job finishes with nett.run(live_analysis=True, analysis_config=...)
+
+CUSTOM_PALETTE = ["#3F8CB7", "#FCEF88", "#5D5797", "#62AC6B", "#B74779", "#2C4E98", "#CCCCE7", "#08625B", "#D15056", "#F2A541", "#FFC0CB"]
+CHICK_RED = "#AF264A"
 
 
 def analyze(
@@ -13,15 +25,16 @@ def analyze(
                 ep_bucket: int = 100,
                 num_episodes: int = 1000,
                 bar_order: str | list[int] = "default",
-                color_bars: bool = True) -> None:
-   
+                color_bars: bool = True,
+                max_workers: Optional[int] = None) -> None:
+
         # TODO may need to clean up this file structure
         # set paths
         run_dir = Path(run_dir).resolve()
         if not run_dir.exists():
             raise FileNotFoundError(f"Run directory {run_dir} does not exist.")
 
-        analysis_dir = Path(__file__).resolve().parent.joinpath("analysis")
+        analysis_dir = Path(__file__).resolve().parent.parent.joinpath("analysis")
         if output_dir is None:
             output_dir = run_dir.joinpath("results")
         output_dir = Path(output_dir).resolve()
@@ -36,33 +49,180 @@ def analyze(
         elif not analysis_dir.exists():
             raise ValueError(f"'{analysis_dir}' is not a valid analysis directory. This is likely an error in the package.")
 
-        # translate bar_order for R to read
-        bar_order_str = str(bar_order).translate({ord(i): None for i in ' []'}) # remove spaces and brackets from bar_order
-
-        # merge
+        # merge, every log is read once and the merged data stays in memory for both analyses
         print("Running merge")
-        subprocess.run(["Rscript", str(analysis_dir.joinpath("NETT_merge_csvs.R")),
-                        "--logs-dir", str(run_dir),
-                        "--results-dir", str(output_dir),
-                        "--results-name", "analysis_data",
-                        "--csv-train", "train_results.csv",
-                        "--csv-test", "test_results.csv"], check=True)
+        train_data, test_data = merge_logs(run_dir, output_dir.joinpath("analysis_data"), max_workers)
+        train_data.to_csv(output_dir.joinpath("train_results.csv"), index=False)
+        test_data.to_csv(output_dir.joinpath("test_results.csv"), index=False)
 
         # train
         print("Running analysis for [train]")
-        subprocess.run(["Rscript", str(analysis_dir.joinpath("NETT_train_viz.R")),
-                        "--data-loc", str(output_dir.joinpath("analysis_data")),
-                        "--results-wd", str(output_dir),
-                        "--ep-bucket", str(ep_bucket),
-                        "--num-episodes", str(num_episodes)], check=True)
+        plot_train(train_data, output_dir, ep_bucket, num_episodes)
 
         # test
         print("Running analysis for [test]")
-        subprocess.run(["Rscript", str(analysis_dir.joinpath("NETT_test_viz.R")),
-                        "--data-loc", str(output_dir.joinpath("analysis_data")),
-                        "--results-wd", str(output_dir),
-                        "--bar-order", bar_order_str,
-                        "--color-bars", str(color_bars),
-                        "--chick-file", str(chick_data_dir)], check=True)
+        chick_data = pd.read_csv(chick_data_dir, encoding="utf-8-sig")
+        plot_test(test_data, chick_data, output_dir, bar_order, color_bars)
 
         print(f"Analysis complete. See results at {output_dir}")
+
+
+def merge_logs(run_dir: str | Path, dataset_dir: str | Path, max_workers: Optional[int] = None) -> tuple[pd.DataFrame, pd.DataFrame]:
+    # only log files that are new or changed since the last merge are parsed again
+    dataset = LogDataset(dataset_dir)
+    dataset.merge(run_dir, max_workers)
+
+    print("Combining training data...")
+    train_data = dataset.load("train")
+    print("Combining testing data...")
+    test_data = dataset.load("test")
+    return train_data, test_data
+
+
+def percent_correct(data: pd.DataFrame) -> pd.DataFrame:
+    # time with the correct monitor out of the time with either monitor, NaN if the agent stayed in the middle
+    on_left = data["correct.monitor"] == "left"
+    correct = data["left_steps"].where(on_left, data["right_steps"])
+    incorrect = data["right_steps"].where(on_left, data["left_steps"])
+    return data.assign(
+        correct_steps=correct,
+        incorrect_steps=incorrect,
+        percent_correct=correct / (correct + incorrect).replace(0, np.nan))
+
+
+def plot_train(train_data: pd.DataFrame, output_dir: str | Path, ep_bucket: int, num_episodes: int) -> pd.DataFrame:
+    print(f"Collating data for {num_episodes} training episodes...")
+    data = percent_correct(train_data[train_data["Episode"] < num_episodes])
+    data = data.assign(episode_block=data["Episode"] // ep_bucket + 1)
+    summary = data.groupby(["imprint.cond", "agent", "episode_block"])["percent_correct"].agg(
+        avgs="mean", sd="std", count="size").reset_index()
+    summary["se"] = summary["sd"] / np.sqrt(summary["count"])
+
+    print("Plotting training data...")
+    num_blocks = num_episodes / ep_bucket
+    for cond, cond_data in summary.groupby("imprint.cond", sort=False):
+        fig = Figure(figsize=(7, 7))
+        ax = fig.subplots()
+        for _, agent_data in cond_data.groupby("agent"):
+            ax.plot(agent_data["episode_block"], agent_data["avgs"])
+        ax.axhline(0.5, linestyle="--", color="black")
+        ax.set_xlabel(f"Groups of {ep_bucket} Episodes", fontsize=16)
+        ax.set_ylabel("Average Time with Imprinted Object", fontsize=16)
+        ax.set_ylim(0, 1)
+        ax.set_yticks(np.arange(0, 1.01, 0.1))
+        ax.yaxis.set_major_formatter(PercentFormatter(1.0, decimals=0))
+        ax.set_xlim(0, num_blocks)
+        ax.set_xticks(np.arange(0, num_blocks + 1, 1))
+        _classic(ax)
+        fig.savefig(Path(output_dir).joinpath(f"{cond}_train.png"))
+    return summary
+
+
+def plot_test(test_data: pd.DataFrame, chick_data: pd.DataFrame, output_dir: str | Path, bar_order: str | list[int] = "default", color_bars: bool = True) -> None:
+    output_dir = Path(output_dir)
+    print("Collating data for test trials...")
+    test_data = percent_correct(test_data)
+
+    print("Adjusting bar order...")
+    order = _bar_order(test_data, bar_order)
+
+    print("Creating agent-level bar charts...")
+    by_test_cond = _t_test_summary(test_data.groupby(["imprint.cond", "agent", "test.cond"], sort=False)["percent_correct"], "avgs")
+    by_test_cond["imp_agent"] = by_test_cond["imprint.cond"].astype(str) + "_" + by_test_cond["agent"].astype(str)
+    by_test_cond.to_csv(output_dir.joinpath("stats_by_agent.csv"), index=False)
+
+    for imp_agent, bar_data in by_test_cond.groupby("imp_agent", sort=False):
+        _bar_chart(bar_data, None, "avgs", chick_data, order, color_bars, output_dir.joinpath(f"{imp_agent}_test.png"))
+
+    # rest trials are left out once agents are grouped, for ease of presentation
+    print("Creating imprinting condition-level bar charts...")
+    by_imp_cond = _t_test_summary(by_test_cond.groupby(["imprint.cond", "test.cond"], sort=False)["avgs"], "avgs_by_imp")
+    by_imp_cond.to_csv(output_dir.joinpath("stats_by_imp_cond.csv"), index=False)
+
+    no_rest = by_test_cond[by_test_cond["test.cond"] != "Rest"]
+    for cond, bar_data in by_imp_cond[by_imp_cond["test.cond"] != "Rest"].groupby("imprint.cond", sort=False):
+        dot_data = no_rest[no_rest["imprint.cond"] == cond]
+        _bar_chart(bar_data, dot_data, "avgs_by_imp", chick_data, order, color_bars, output_dir.joinpath(f"{cond}_test.png"))
+
+    print("Creating bar chart for all imprinting conditions...")
+    across_imp_cond = _t_test_summary(no_rest.groupby("test.cond", sort=False)["avgs"], "all_avgs")
+    across_imp_cond.to_csv(output_dir.joinpath("stats_across_all_agents.csv"), index=False)
+    _bar_chart(across_imp_cond, no_rest, "all_avgs", chick_data, order, color_bars, output_dir.joinpath("all_imprinting_conds_test.png"))
+
+
+def _t_test_summary(grouped: "pd.core.groupby.SeriesGroupBy", name: str) -> pd.DataFrame:
+    # mean, spread and a one-sample t-test against chance (0.5) for every group
+    summary = grouped.agg(**{name: "mean"}, sd="std", count="size").reset_index()
+    tests = grouped.apply(_t_test).reset_index(drop=True)
+    summary[["tval", "df", "pval"]] = pd.DataFrame(tests.tolist(), columns=["tval", "df", "pval"])
+    summary["se"] = summary["sd"] / np.sqrt(summary["count"])
+    summary["cohensd"] = (summary[name] - 0.5) / summary["sd"]
+    return summary
+
+
+def _t_test(values: pd.Series) -> tuple[float, float, float]:
+    values = values.dropna()
+    # like R's t.test, too few or constant values have no test
+    if len(values) < 2 or values.nunique() < 2:
+        return (np.nan, np.nan, np.nan)
+    result = stats.ttest_1samp(values, 0.5)
+    return (result.statistic, len(values) - 1, result.pvalue)
+
+
+def _bar_order(test_data: pd.DataFrame, bar_order: str | list[int]) -> list[str]:
+    # alphabetical by default, by episode-level percent correct for asc/desc,
+    # or the alphabetical conditions picked by 1-based indices
+    conditions = sorted(test_data["test.cond"].dropna().unique())
+    if bar_order == "default":
+        return conditions
+    if bar_order in ("asc", "desc"):
+        ordered = test_data.sort_values("percent_correct", ascending=bar_order == "asc", na_position="last", kind="stable")
+        return list(ordered["test.cond"].dropna().unique())
+    if isinstance(bar_order, str):
+        bar_order = [int(index) for index in bar_order.translate({ord(i): None for i in " []"}).split(",")]
+    return [conditions[index - 1] for index in bar_order]
+
+
+def _bar_chart(data: pd.DataFrame, dots: Optional[pd.DataFrame], y: str, chick_data: pd.DataFrame, order: list[str], color_bars: bool, img_name: Path) -> None:
+    # conditions missing from the order (e.g. only in the chick data) go last
+    categories = [cond for cond in order if cond in set(data["test.cond"]) | set(chick_data["test.cond"])]
+    categories += [cond for cond in pd.unique(pd.concat([data["test.cond"], chick_data["test.cond"]])) if cond not in categories]
+    position = {cond: i for i, cond in enumerate(categories)}
+    colors = {cond: CUSTOM_PALETTE[i % len(CUSTOM_PALETTE)] for i, cond in enumerate(categories)}
+
+    fig = Figure(figsize=(6, 6))
+    ax = fig.subplots()
+    x = data["test.cond"].map(position).to_numpy(dtype=float)
+    # model performance: bars, error bars and one dot per agent
+    ax.bar(x, data[y], width=0.7, color=[colors[cond] for cond in data["test.cond"]] if color_bars else "#737373", zorder=1)
+    ax.errorbar(x, data[y], yerr=data["se"], fmt="none", ecolor="black", capsize=6, zorder=2)
+    if dots is not None:
+        jitter = np.random.uniform(-0.3, 0.3, len(dots))
+        ax.scatter(dots["test.cond"].map(position).to_numpy(dtype=float) + jitter, dots["avgs"], color="black", s=8, zorder=3)
+
+    # chick performance on top: the average as a line with a ribbon for its deviation
+    chick_x = chick_data["test.cond"].map(position).to_numpy(dtype=float)
+    ax.hlines(chick_data["avg"], chick_x - 0.35, chick_x + 0.35, colors=CHICK_RED, zorder=4)
+    ax.bar(chick_x, 2 * chick_data["avg_dev"], bottom=chick_data["avg"] - chick_data["avg_dev"], width=0.7, color=CHICK_RED, alpha=0.2, linewidth=0, zorder=4)
+
+    ax.axhline(0.5, linestyle="--", color="black", zorder=0)
+    ax.set_xticks(range(len(categories)))
+    ax.set_xticklabels(categories, fontweight="bold", fontsize=7.5)
+    ax.set_xlim(-0.5, len(categories) - 0.5)
+    ax.set_ylim(0, 1)
+    ax.set_yticks(np.arange(0, 1.01, 0.1))
+    ax.yaxis.set_major_formatter(PercentFormatter(1.0, decimals=0))
+    for label in ax.get_yticklabels():
+        label.set_fontweight("bold")
+        label.set_fontsize(7.5)
+    ax.set_xlabel("Test Condition", fontweight="bold")
+    ax.set_ylabel("Percent Correct", fontweight="bold")
+    _classic(ax)
+    fig.savefig(img_name)
+
+
+def _classic(ax: Axes) -> None:
+    # like ggplot's theme_classic: axis lines only, no grid
+    ax.spines["top"].set_visible(False)
+    ax.spines["right"].set_visible(False)
+    ax.grid(False)
@@ -2,9 +2,10 @@ from pathlib import Path
 import sys
 from utils.job import Job
 from tqdm import tqdm
-from stable_baselines3.common.callbacks import BaseCallback, CheckpointCallback, CallbackList
+from stable_baselines3.common.callbacks import BaseCallback, CallbackList
 from stable_baselines3.common.logger import HParam
 from utils.callbacks import MemoryCallback, HParamCallback, MultiBarCallback
+from nett.utils.callbacks.checkpoint_callback import AsyncCheckpointCallback
 
 # from nett.utils.train import compute_train_performance
 
@@ -19,19 +20,21 @@ def initialize_callbacks(job: Job) -> CallbackList:
     if job.estimate_memory:
         callback_list.extend([
             # creates the parallel progress bars
-            MultiBarCallback(job.index, "Estimating Memory Usage"), # TODO: Add progress bars to test aswell
+            MultiBarCallback(job.index, "Estimating Memory Usage"),
             # creates the memory callback for estimation of memory for a single job
-            MemoryCallback(job.device, save_path=job.paths["base"])
+            MemoryCallback(job.device, save_path=job.paths["base"], device_type=job.device_type)
             ])
     else:
         # creates the parallel progress bars
-        callback_list.append(MultiBarCallback(job.index, f"{job.condition}-{job.brain_id}", job.iterations["train"])) # TODO: Add progress bars to test aswell
+        callback_list.append(MultiBarCallback(job.index, f"{job.condition}-{job.brain_id}", job.iterations["train"], heartbeat_path=job.heartbeat_path))
 
     if job.save_checkpoints:
-        callback_list.append(CheckpointCallback(
-            save_freq=job.checkpoint_freq, # defaults to 30_000 steps
+        # snapshots are written from a background thread so that the rollout is not held up
+        callback_list.append(AsyncCheckpointCallback(
+            save_freq=job.checkpoint_freq, # defaults to 30_000 steps, summed over the environment copies
             save_path=job.paths["checkpoints"],
-            save_replay_buffer=True,
-            save_vecnormalize=True))
+            keep_last=job.keep_checkpoints,
+            # skipped for on-policy algorithms, which have no replay buffer
+            save_replay_buffer=True))
 
     return CallbackList(callback_list)
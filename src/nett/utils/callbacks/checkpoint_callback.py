@@ -0,0 +1,114 @@
+import os
+from pathlib import Path
+from typing import Any, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import torch
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.base_class import BaseAlgorithm
+
+
+class AsyncCheckpointCallback(BaseCallback):
+
+    def __init__(self, save_freq: int, save_path: Path | str, name_prefix: str = "rl_model", keep_last: Optional[int] = 3, save_replay_buffer: bool = False) -> None:
+        super().__init__()
+        self.save_freq = save_freq
+        self.save_path = Path(save_path)
+        self.name_prefix = name_prefix
+        # number of checkpoints kept on disk, None keeps all of them
+        self.keep_last = keep_last
+        # only off-policy algorithms have a replay buffer, it is pickled on the training thread
+        self.save_replay_buffer = save_replay_buffer
+        self._writer: Optional[ThreadPoolExecutor] = None
+        self._pending: Optional[Future] = None
+        self._save_calls = save_freq
+
+    def _init_callback(self) -> None:
+        self.save_path.mkdir(parents=True, exist_ok=True)
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nett-checkpoint")
+        # save_freq counts environment steps, each call steps every environment copy once
+        self._save_calls = max(self.save_freq // self.training_env.num_envs, 1)
+
+    def _on_step(self) -> bool:
+        if self.n_calls % self._save_calls == 0:
+            self._checkpoint()
+        return True
+
+    def _on_training_end(self) -> None:
+        # the last checkpoint has to be on disk before the job moves on
+        self._wait()
+        self._writer.shutdown()
+
+    def _checkpoint(self) -> None:
+        # at most one snapshot waits to be written, which bounds the extra host memory
+        self._wait()
+        # copying to host memory is the only part that holds up the rollout
+        snapshot = {
+            "policy": _to_cpu(self.model.policy.state_dict()),
+            "optimizer": _to_cpu(self.model.policy.optimizer.state_dict()),
+            "num_timesteps": self.model.num_timesteps,
+            "n_updates": getattr(self.model, "_n_updates", 0)
+        }
+        path = self.save_path.joinpath(f"{self.name_prefix}_{self.num_timesteps}_steps.pt")
+        self._pending = self._writer.submit(self._write, snapshot, path)
+        if self.verbose >= 2:
+            print(f"Saving model checkpoint to {path}")
+
+        if self.save_replay_buffer and getattr(self.model, "replay_buffer", None) is not None:
+            self.model.save_replay_buffer(self._replay_buffer_path(path))
+
+    def _write(self, snapshot: dict[str, Any], path: Path) -> None:
+        # write to a temporary file first so that an interrupted write never looks like a checkpoint
+        tmp_path = path.with_suffix(".tmp")
+        torch.save(snapshot, tmp_path)
+        os.replace(tmp_path, path)
+        self._prune()
+
+    def _prune(self) -> None:
+        if self.keep_last is None:
+            return
+        for pattern in (f"{self.name_prefix}_*_steps.pt", f"{self.name_prefix}_replay_buffer_*_steps.pkl"):
+            checkpoints = sorted(self.save_path.glob(pattern), key=lambda path: int(path.stem.split("_")[-2]))
+            for path in checkpoints[:-self.keep_last]:
+                path.unlink(missing_ok=True)
+
+    def _wait(self) -> None:
+        # surfaces errors from the previous write on the training thread
+        if self._pending is not None:
+            self._pending.result()
+            self._pending = None
+
+    @staticmethod
+    def restore(model: BaseAlgorithm, path: Path | str) -> BaseAlgorithm:
+        # continue from a checkpoint written by this callback, the model has to be built with the same configuration
+        snapshot = torch.load(path, map_location=model.device)
+        model.policy.load_state_dict(snapshot["policy"])
+        model.policy.optimizer.load_state_dict(snapshot["optimizer"])
+        model.num_timesteps = snapshot["num_timesteps"]
+        model._n_updates = snapshot["n_updates"]
+        return AsyncCheckpointCallback.load_replay_buffer(model, path)
+
+    @staticmethod
+    def load_replay_buffer(model: BaseAlgorithm, path: Path | str) -> BaseAlgorithm:
+        # off-policy algorithms continue with the replay buffer saved next to the checkpoint
+        replay_buffer_path = AsyncCheckpointCallback._replay_buffer_path(Path(path))
+        if getattr(model, "replay_buffer", None) is not None and replay_buffer_path.exists():
+            model.load_replay_buffer(replay_buffer_path)
+        return model
+
+    @staticmethod
+    def _replay_buffer_path(path: Path) -> Path:
+        # <prefix>_<steps>_steps.pt (or .zip) -> <prefix>_replay_buffer_<steps>_steps.pkl, as named by stable-baselines3
+        prefix, steps, _ = path.stem.rsplit("_", 2)
+        return path.with_name(f"{prefix}_replay_buffer_{steps}_steps.pkl")
+
+
+def _to_cpu(state: Any) -> Any:
+    # a detached host copy of every tensor in a (nested) state dict
+    if torch.is_tensor(state):
+        return state.detach().to("cpu", copy=True)
+    if isinstance(state, dict):
+        return {key: _to_cpu(value) for key, value in state.items()}
+    if isinstance(state, (list, tuple)):
+        return type(state)(_to_cpu(value) for value in state)
+    return state
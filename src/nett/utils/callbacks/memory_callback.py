@@ -1,37 +1,123 @@
+import os
+import json
 from pathlib import Path
-from tqdm import tqdm
+from typing import Optional
 
-from stable_baselines3.common.callbacks import BaseCallback, CheckpointCallback, CallbackList
-from stable_baselines3.common.logger import HParam
+import numpy as np
+import torch
+
+from stable_baselines3.common.callbacks import BaseCallback
+
+from nett.utils.processes import process_rss, process_tree
 
 # from nett.utils.train import compute_train_performance
 
-from pynvml import nvmlDeviceGetHandleByIndex, nvmlDeviceGetMemoryInfo, nvmlInit
+from pynvml import (
+    NVMLError,
+    nvmlInit,
+    nvmlDeviceGetHandleByIndex,
+    nvmlDeviceGetMemoryInfo,
+    nvmlDeviceGetComputeRunningProcesses,
+    nvmlDeviceGetGraphicsRunningProcesses
+)
 
 class MemoryCallback(BaseCallback):
 
-    def __init__(self, device: int, save_path: str) -> None:
+    def __init__(self, device: int, save_path: str, device_type: str = "cuda", sample_freq: int = 16) -> None:
         super().__init__()
         self.device = device
         self.save_path = save_path
+        self.device_type = device_type
+        # how often (in steps) the memory of the job's processes is sampled during the rollout
+        self.sample_freq = sample_freq
         self.close = False
-        nvmlInit()
+        # highest memory seen for the job's processes, and whether it was measured per process or per device
+        self.peak = 0
+        self.source = "process"
+        if self.device_type == "cuda":
+            nvmlInit()
+            self.handle = nvmlDeviceGetHandleByIndex(self.device)
+
+    def _on_training_start(self) -> None:
+        # torch's peak counters capture the optimizer step, which sampling between steps would miss
+        if self.device_type == "cuda":
+            torch.cuda.reset_peak_memory_stats(self.device)
+        self._sample()
 
     def _on_step(self) -> bool:
 
         if self.close:
-            # Create a temporary directory to store the memory usage
-            # os.makedirs("./.tmp", exist_ok=True)
-            # Grab the memory being used by the GPU
-            used_memory = nvmlDeviceGetMemoryInfo(nvmlDeviceGetHandleByIndex(self.device)).used
-            # Write the used memory to a file
-            with open(Path.joinpath(self.save_path, "mem.txt"), "w") as f:
-                f.write(str(used_memory))
+            # the first rollout and the first gradient update are done, report the profile and stop
+            with open(Path.joinpath(self.save_path, "mem.json"), "w") as f:
+                json.dump(self.profile(), f)
             # Close the callback
             return False
+
+        if self.n_calls % self.sample_freq == 0:
+            self._sample()
         return True
 
     def _on_rollout_end(self) -> None:
-   
+        # the gradient update runs between this and the next step
+        self._sample()
         self.close = True
-        pass
+
+    def profile(self) -> dict[str, int | str]:
+        current = self._sample()
+        profile = {
+            "rollout_buffer": self._buffer_bytes(),
+            "model": sum(tensor.numel() * tensor.element_size() for tensor in self.model.policy.state_dict().values()),
+            "optimizer": self._optimizer_bytes(),
+            "source": self.source
+        }
+        if self.device_type == "cuda":
+            # substitute the allocator's peak for its current reservation to account for the update spike
+            profile["torch_peak"] = torch.cuda.max_memory_reserved(self.device)
+            current += profile["torch_peak"] - torch.cuda.memory_reserved(self.device)
+        profile["peak"] = max(self.peak, current)
+        return profile
+
+    def _sample(self) -> int:
+        if self.device_type == "cuda":
+            used = self._process_gpu_memory()
+            # fall back to the whole device when NVML cannot attribute memory to processes (e.g. in containers)
+            if used is None:
+                self.source = "device"
+                used = nvmlDeviceGetMemoryInfo(self.handle).used
+        else:
+            used = sum(process_rss(pid) for pid in process_tree(os.getpid()))
+        self.peak = max(self.peak, used)
+        return used
+
+    def _process_gpu_memory(self) -> Optional[int]:
+        # GPU memory used by this process and its children (e.g. the Unity executables)
+        pids = set(process_tree(os.getpid()))
+        try:
+            processes = nvmlDeviceGetComputeRunningProcesses(self.handle) + nvmlDeviceGetGraphicsRunningProcesses(self.handle)
+        except NVMLError:
+            return None
+        # the same process can be listed as both compute and graphics
+        used = {process.pid: process.usedGpuMemory for process in processes if process.pid in pids}
+        if not used or None in used.values():
+            return None
+        return sum(used.values())
+
+    def _buffer_bytes(self) -> int:
+        buffer = getattr(self.model, "rollout_buffer", None) or getattr(self.model, "replay_buffer", None)
+        if buffer is None:
+            return 0
+        arrays = []
+        for value in vars(buffer).values():
+            arrays.extend(value.values() if isinstance(value, dict) else [value])
+        return sum(array.nbytes for array in arrays if isinstance(array, np.ndarray))
+
+    def _optimizer_bytes(self) -> int:
+        optimizer = getattr(self.model.policy, "optimizer", None)
+        if optimizer is None:
+            return 0
+        return sum(
+            value.numel() * value.element_size()
+            for state in optimizer.state.values()
+            for value in state.values()
+            if torch.is_tensor(value)
+        )
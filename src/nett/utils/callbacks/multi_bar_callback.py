@@ -1,5 +1,9 @@
 
+import time
 from pathlib import Path
+from typing import Optional
+
+import torch
 from stable_baselines3.common.callbacks import BaseCallback, CheckpointCallback, CallbackList
 from stable_baselines3.common.logger import HParam
 import sys
@@ -9,10 +13,12 @@ from tqdm import tqdm
 
 from pynvml import nvmlDeviceGetHandleByIndex, nvmlDeviceGetMemoryInfo, nvmlInit
 
+from nett.utils.heartbeat import Heartbeat
+
 class MultiBarCallback(BaseCallback):
 
 
-    def __init__(self, index: int, label: str, num_steps: int = None) -> None:
+    def __init__(self, index: int, label: str, num_steps: int = None, heartbeat_path: Optional[Path] = None, heartbeat_interval: float = 5.0) -> None:
         super().__init__()
         # where on the screen the progress bar will be displayed
         self.index = index
@@ -22,21 +28,46 @@ class MultiBarCallback(BaseCallback):
         self.pbar = None
         # number of steps to be done
         self.num_steps = num_steps
+        # progress reported to NETT.status, if a path is given
+        self.heartbeat = Heartbeat(heartbeat_path, heartbeat_interval) if heartbeat_path is not None else None
+        # timestep and time of the previous heartbeat, to measure the current throughput
+        self._last_timestep = 0
+        self._last_time = 0.0
 
     def _on_training_start(self) -> None:
         # if num_steps is None, this means that memory estimation is being done, so the length of a single rollout will be used
-        num_steps = self.num_steps if self.num_steps is not None else self.model.n_steps
+        num_steps = self.num_steps if self.num_steps is not None else self.model.n_steps * self.training_env.num_envs
         # Initialize progress bar
         # Remove timesteps that wer4e done in previous training sessions
-        self.pbar = tqdm(total=(num_steps), position=self.index, dynamic_ncols=True, desc=self.label, file=sys.stdout)
-        pass
+        self.pbar = tqdm(total=(num_steps), initial=self.model.num_timesteps if self.num_steps is not None else 0, position=self.index, dynamic_ncols=True, desc=self.label, file=sys.stdout)
+        self._last_timestep, self._last_time = self.model.num_timesteps, time.time()
+        self._beat(force=True)
 
     def _on_step(self) -> bool:
         # Update progress bar, we do num_envs steps per call to `env.step()`
         self.pbar.update(self.training_env.num_envs)
+        self._beat()
         return True
 
     def _on_training_end(self) -> None:
         self.pbar.refresh()
         self.pbar.close()
-        pass
+        self._beat(force=True)
+
+    def _beat(self, force: bool = False) -> None:
+        if self.heartbeat is None:
+            return
+        now = time.time()
+        elapsed = now - self._last_time
+        # throughput since the previous heartbeat, so that slowdowns show up right away
+        steps_per_sec = (self.model.num_timesteps - self._last_timestep) / elapsed if elapsed > 0 else 0.0
+        remaining = max(0, self.pbar.total - self.model.num_timesteps)
+        if self.heartbeat.beat(
+            force=force,
+            phase="train",
+            timestep=self.model.num_timesteps,
+            total_timesteps=self.pbar.total,
+            steps_per_sec=steps_per_sec,
+            eta=remaining / steps_per_sec if steps_per_sec > 0 else None,
+            gpu_memory=torch.cuda.memory_reserved(self.model.device) if self.model.device.type == "cuda" else None):
+            self._last_timestep, self._last_time = self.model.num_timesteps, now
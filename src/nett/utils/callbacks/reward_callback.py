@@ -0,0 +1,21 @@
+from collections import deque
+
+from stable_baselines3.common.callbacks import BaseCallback
+
+
+class RewardCallback(BaseCallback):
+
+    def __init__(self, maxlen: int = 100_000) -> None:
+        super().__init__()
+        # ring buffers of the most recent episodes, the timestep each one ended at and its reward
+        self.timesteps: deque[int] = deque(maxlen=maxlen)
+        self.rewards: deque[float] = deque(maxlen=maxlen)
+
+    def _on_step(self) -> bool:
+        # VecMonitor adds the episode statistics to the info of every environment copy that finished an episode
+        for info in self.locals.get("infos", []):
+            episode = info.get("episode")
+            if episode is not None:
+                self.timesteps.append(self.num_timesteps)
+                self.rewards.append(float(episode["r"]))
+        return True
@@ -0,0 +1,141 @@
+import os
+import re
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Optional
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from nett import logger
+
+# columns that identify an episode in the Unity logs
+EPISODE_COLUMNS = ["Episode", "left.monitor", "right.monitor", "correct.monitor", "experiment.phase", "imprint.cond", "test.cond"]
+
+# the chamber spans [-10, 10] on the x axis, agents closer than a third of it to a monitor are with that monitor
+LOWER_X_LIM, UPPER_X_LIM = -10, 10
+LOWER_BOUND = LOWER_X_LIM + (UPPER_X_LIM - LOWER_X_LIM) / 3
+UPPER_BOUND = UPPER_X_LIM - (UPPER_X_LIM - LOWER_X_LIM) / 3
+
+PHASES = ("train", "test")
+
+
+def summarize_log(path: str | Path) -> pd.DataFrame:
+    # steps spent in each zone, per episode of a single log file
+    data = pd.read_csv(path, skipinitialspace=True, usecols=lambda column: column in EPISODE_COLUMNS + ["agent.x"])
+    return summarize_steps(data, Path(path).name)
+
+
+def summarize_steps(data: pd.DataFrame, filename: str) -> pd.DataFrame:
+    left = data["agent.x"] < LOWER_BOUND
+    right = data["agent.x"] > UPPER_BOUND
+    data = data[EPISODE_COLUMNS].assign(
+        left_steps=left.astype(int),
+        right_steps=right.astype(int),
+        middle_steps=(~left & ~right).astype(int))
+
+    data = data.groupby(EPISODE_COLUMNS, dropna=False, sort=True).sum().reset_index()
+    data["Episode"] = pd.to_numeric(data["Episode"])
+
+    # add columns for original filename and agent ID number
+    data["filename"] = filename
+    data["agent"] = pd.to_numeric(re.sub(r"\D", "", filename) or np.nan)
+    return data
+
+
+def log_phase(path: Path) -> Optional[str]:
+    # log files are named with the agent ID as their only number and end with train.csv or test.csv
+    # for example "fork_side-agent3_train.csv"
+    return next((phase for phase in PHASES if path.name.endswith(f"{phase}.csv")), None)
+
+
+def partition(path: Path, run_dir: Path) -> tuple[str, int]:
+    # (condition, brain_id) from the run tree, output_dir/<condition>/brain_<id>/env_logs/...
+    parts = path.relative_to(run_dir).parts
+    for i, part in enumerate(parts[:-1]):
+        if match := re.fullmatch(r"brain_(\d+)", part):
+            return (parts[i - 1] if i > 0 else "unknown", int(match.group(1)))
+    return ("unknown", -1)
+
+
+def _merge_file(path: Path, part_path: Path, condition: str, brain_id: int) -> int:
+    # runs in a worker process, only the number of merged episodes is sent back
+    data = summarize_log(path).assign(condition=condition, brain_id=brain_id)
+    part_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = part_path.with_suffix(f".{os.getpid()}.tmp")
+    data.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, part_path)
+    return len(data)
+
+
+class LogDataset:
+
+    INDEX: str = "index.json"
+
+    def __init__(self, path: Path | str) -> None:
+        self.logger = logger.getChild(__class__.__name__)
+        # per-episode summaries partitioned as <phase>/condition=<condition>/brain_id=<id>/<file>.csv
+        self.path = Path(path)
+        self.index_path = self.path.joinpath(self.INDEX)
+
+    def merge(self, run_dir: Path | str, max_workers: Optional[int] = None) -> dict[str, int]:
+        # summarize new and changed log files in parallel, drop the ones that disappeared
+        run_dir = Path(run_dir).resolve()
+        index = self._read_index()
+        seen, todo = set(), []
+        for path in sorted(run_dir.rglob("*.csv")):
+            phase = log_phase(path)
+            if phase is None or self.path.resolve() in path.parents:
+                continue
+            key = str(path.relative_to(run_dir))
+            seen.add(key)
+            stat = path.stat()
+            entry = index.get(key)
+            if entry is not None and (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns) and self.path.joinpath(entry["part"]).exists():
+                continue
+            condition, brain_id = partition(path, run_dir)
+            part = Path(phase, f"condition={condition}", f"brain_id={brain_id}", f"{hashlib.sha1(key.encode()).hexdigest()}.csv")
+            index[key] = {"phase": phase, "part": str(part), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+            todo.append((path, self.path.joinpath(part), condition, brain_id))
+
+        for key in set(index) - seen:
+            self.path.joinpath(index.pop(key)["part"]).unlink(missing_ok=True)
+
+        self.logger.info(f"Merging {len(todo)} new or changed log files, {len(seen) - len(todo)} unchanged")
+        if todo:
+            # a single file is not worth starting a process pool for
+            if len(todo) == 1:
+                _merge_file(*todo[0])
+            else:
+                with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                    chunksize = max(1, len(todo) // ((max_workers or os.cpu_count() or 1) * 4))
+                    list(executor.map(_merge_file, *zip(*todo), chunksize=chunksize))
+        self._write_index(index)
+        return {phase: sum(entry["phase"] == phase for entry in index.values()) for phase in PHASES}
+
+    def load(self, phase: str) -> pd.DataFrame:
+        # in the order of the log files, like a serial merge
+        parts = [entry["part"] for _, entry in sorted(self._read_index().items()) if entry["phase"] == phase]
+        if not parts:
+            raise FileNotFoundError(f"No {phase} files found.")
+        return pd.concat([pd.read_csv(self.path.joinpath(part)) for part in parts], ignore_index=True)
+
+    def _read_index(self) -> dict[str, dict[str, Any]]:
+        try:
+            with open(self.index_path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            self.logger.warning(f"Dataset index at {self.index_path} is corrupt, merging everything again")
+            return {}
+
+    def _write_index(self, index: dict[str, dict[str, Any]]) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first so that an interrupted merge leaves the previous index intact
+        tmp_path = self.index_path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(index, file, indent=2)
+        os.replace(tmp_path, self.index_path)
@@ -0,0 +1,38 @@
+import os
+import json
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+
+class Heartbeat:
+
+    def __init__(self, path: Path | str, interval: float = 5.0) -> None:
+        self.path = Path(path)
+        # minimum number of seconds between two writes, to keep the training loop cheap
+        self.interval = interval
+        self._last_beat: Optional[float] = None
+
+    def beat(self, force: bool = False, **fields: Any) -> bool:
+        now = time.time()
+        if not force and self._last_beat is not None and now - self._last_beat < self.interval:
+            return False
+        self._last_beat = now
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first so that readers never see a partial heartbeat
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump({"time": now, "pid": os.getpid()} | fields, file, default=str)
+        os.replace(tmp_path, self.path)
+        return True
+
+    @staticmethod
+    def read(path: Path | str) -> Optional[dict[str, Any]]:
+        try:
+            with open(path, "r") as file:
+                heartbeat = json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        # seconds since the job last reported, a growing age points to a stalled job
+        heartbeat["age"] = time.time() - heartbeat["time"]
+        return heartbeat
@@ -1,23 +1,32 @@
 from pathlib import Path
-from typing import Final, Any
+from typing import Final, Any, Optional
 from nett import logger
 
 class Job:
 
   _MODES: Final = ("train", "test", "full")
+  _DEVICE_TYPES: Final = ("cuda", "cpu")
 
   @classmethod
-  def initialize(cls, mode: str, output_dir: Path | str, steps_per_episode: int, save_checkpoints: bool, checkpoint_freq: int,  reward: str, batch_mode: bool, iterations: dict[str, int]) -> None:
+  def initialize(cls, mode: str, output_dir: Path | str, steps_per_episode: int, save_checkpoints: bool, checkpoint_freq: int,  reward: str, batch_mode: bool, iterations: dict[str, int], num_envs: int = 1, num_test_conditions: int = 1, record_test: bool = False, device_type: str = "cuda", num_threads: Optional[int] = None, resume: bool = False, keep_checkpoints: Optional[int] = 3) -> None:
     cls.mode = cls._validate_mode(mode)
     cls.steps_per_episode: int = steps_per_episode
     cls.checkpoint_freq: int = checkpoint_freq
+    # number of most recent checkpoints kept on disk, None keeps all of them
+    cls.keep_checkpoints: Optional[int] = keep_checkpoints
     cls.output_dir: Path = output_dir
     cls.reward: str = reward
     cls.save_checkpoints: bool = save_checkpoints
     cls.batch_mode: bool = batch_mode
     cls.iterations: dict[str, int] = iterations
+    cls.num_envs: int = num_envs
+    cls.num_test_conditions: int = num_test_conditions
+    cls.record_test: bool = record_test
+    cls.device_type: str = cls._validate_device_type(device_type)
+    cls.num_threads: Optional[int] = num_threads
+    cls.resume: bool = resume
 
-  def __init__(self, brain_id: int, condition: str, device: int, index: int, port: int, estimate_memory: bool = False) -> None:
+  def __init__(self, brain_id: int, condition: str, device: int, index: int, port: int, estimate_memory: bool = False, completed_phases: Optional[set[str]] = None) -> None:
     self.device: int = device
     self.condition: str = condition
     self.brain_id: int = brain_id
@@ -26,6 +35,8 @@ class Job:
     self.index: int = index
     self.port: int = port
     self.estimate_memory: bool = estimate_memory
+    # phases already finished by an earlier run, when resuming
+    self.completed_phases: set[str] = completed_phases or set()
 
     # Initialize logger
 
@@ -42,20 +53,62 @@ class Job:
 
     return paths
 
-  def env_kwargs(self) -> dict[str, Any]:
+  @property
+  def phases(self) -> list[str]:
+    # phases this job still has to run
+    phases = ["train", "test"] if self.mode == "full" else [self.mode]
+    return [phase for phase in phases if phase not in self.completed_phases]
+
+  def latest_checkpoint(self) -> Optional[Path]:
+    # checkpoints are saved as <prefix>_<num_timesteps>_steps.pt, or .zip by older runs
+    checkpoints = [path for path in self.paths["checkpoints"].glob("*_steps.*") if path.suffix in (".pt", ".zip")]
+    return max(checkpoints, key=lambda path: int(path.stem.split("_")[-2]), default=None)
+
+  @property
+  def heartbeat_path(self) -> Path:
+    # progress of the running phase, rewritten periodically by the progress bar callback
+    return self.paths["base"].joinpath("heartbeat.json")
+
+  @property
+  def ports(self) -> list[int]:
+    # one port per environment copy, starting at the job's base port
+    return list(range(self.port, self.port + self.num_envs))
+
+  @property
+  def num_test_envs(self) -> int:
+    # largest number of copies that splits the test cycles evenly, so that every copy
+    # walks through the same sequence of test conditions and finishes at the same time
+    cycles = self.iterations.get("test", 0) // self.num_test_conditions
+    return max(n for n in range(1, self.num_envs + 1) if cycles % n == 0)
+
+  @property
+  def torch_device(self) -> str:
+    # on CPU, the device index is a worker slot rather than a torch device
+    return f"cuda:{self.device}" if self.device_type == "cuda" else "cpu"
+
+  def env_kwargs(self, rank: int = 0) -> dict[str, Any]:
+    rec_path, log_path = self.paths["env_recs"], self.paths["env_logs"]
+    # give every environment copy its own log directory so the Unity logs do not collide
+    if self.num_envs > 1:
+      rec_path, log_path = rec_path.joinpath(f"worker_{rank}"), log_path.joinpath(f"worker_{rank}")
     return {
       "rewarded": bool(self.reward == "supervised"),
-      "rec_path": str(self.paths["env_recs"]),
-      "log_path": str(self.paths["env_logs"]),
+      "rec_path": str(rec_path),
+      "log_path": str(log_path),
       "condition": self.condition,
       "brain_id": self.brain_id,
-      "device": self.device,
       "episode_steps": self.steps_per_episode,
       "batch_mode": self.batch_mode
-    }
+    } | ({"device": self.device} if self.device_type == "cuda" else {})
 
   @staticmethod
   def _validate_mode(mode: str) -> str:
     if mode not in Job._MODES:
       raise ValueError(f"Unknown mode type {mode}, should be one of {Job._MODES}")
-    return mode
\ No newline at end of file
+    return mode
+
+  @staticmethod
+  def _validate_device_type(device_type: str) -> str:
+    if device_type not in Job._DEVICE_TYPES:
+      raise ValueError(f"Unknown device type {device_type}, should be one of {Job._DEVICE_TYPES}")
+    return device_type
\ No newline at end of file
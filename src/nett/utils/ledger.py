@@ -0,0 +1,63 @@
+import json
+import time
+import fcntl
+from pathlib import Path
+from typing import Any, Final
+
+from nett import logger
+from nett.utils.job import Job
+
+
+class Ledger:
+
+    FILENAME: Final = "ledger.jsonl"
+    _STATES: Final = ("started", "completed", "failed")
+
+    def __init__(self, output_dir: Path | str) -> None:
+        self.logger = logger.getChild(__class__.__name__)
+        # append-only, one JSON record per line, so a crash can at most lose the line being written
+        self.path = Path(output_dir).joinpath(self.FILENAME)
+
+    def record(self, job: Job, phase: str, state: str, **details: Any) -> None:
+        if state not in self._STATES:
+            raise ValueError(f"Unknown state {state}, should be one of {self._STATES}")
+        entry = {"time": time.time(), "condition": job.condition, "brain_id": job.brain_id, "phase": phase, "state": state} | details
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a") as file:
+            # jobs in other processes append to the same ledger
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                file.write(json.dumps(entry, default=str) + "\n")
+                file.flush()
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def entries(self) -> list[dict[str, Any]]:
+        if not self.path.exists():
+            return []
+        entries = []
+        with open(self.path, "r") as file:
+            for line in file:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # a partial line left behind by a crash
+                    self.logger.warning(f"Skipping malformed ledger entry: {line.strip()}")
+        return entries
+
+    def latest(self) -> dict[tuple[str, int, str], dict[str, Any]]:
+        # the most recent entry for every (condition, brain_id, phase)
+        return {(entry["condition"], entry["brain_id"], entry["phase"]): entry for entry in self.entries()}
+
+    def completed(self) -> dict[tuple[str, int], set[str]]:
+        # phases that finished for every (condition, brain_id)
+        completed: dict[tuple[str, int], set[str]] = {}
+        for (condition, brain_id, phase), entry in self.latest().items():
+            if entry["state"] == "completed":
+                completed.setdefault((condition, brain_id), set()).add(phase)
+        return completed
+
+    def remaining(self, tasks: set[tuple[str, int]], phases: set[str]) -> set[tuple[str, int]]:
+        # tasks with at least one of the phases still to run
+        completed = self.completed()
+        return {task for task in tasks if not phases <= completed.get(task, set())}
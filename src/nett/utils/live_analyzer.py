@@ -0,0 +1,156 @@
+import io
+import threading
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from nett import logger
+from nett.utils.scheduler import Scheduler
+from nett.utils.analyze import analyze, percent_correct, plot_train
+from nett.utils.dataset import EPISODE_COLUMNS, log_phase, partition, summarize_steps
+
+
+class LogTail:
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.offset = 0
+        self.header: Optional[str] = None
+        # per-episode zone counts of everything read so far
+        self.episodes: Optional[pd.DataFrame] = None
+
+    def update(self) -> bool:
+        # read the lines appended since the last call, up to the last complete one
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return False
+        if size < self.offset:
+            # the file was rewritten, start over
+            self.offset, self.header, self.episodes = 0, None, None
+        if size == self.offset:
+            return False
+
+        with open(self.path, "rb") as file:
+            file.seek(self.offset)
+            chunk = file.read(size - self.offset)
+        end = chunk.rfind(b"\n") + 1
+        if end == 0:
+            return False
+        self.offset += end
+        lines = chunk[:end].decode()
+        if self.header is None:
+            self.header, lines = lines.split("\n", 1)
+        if not lines:
+            return False
+
+        steps = pd.read_csv(io.StringIO(self.header + "\n" + lines), skipinitialspace=True,
+                            usecols=lambda column: column in EPISODE_COLUMNS + ["agent.x"])
+        new = summarize_steps(steps, self.path.name)
+        # the episode being played when the chunk was cut continues in the next one
+        combined = new if self.episodes is None else pd.concat([self.episodes, new], ignore_index=True)
+        self.episodes = combined.groupby(EPISODE_COLUMNS + ["filename", "agent"], dropna=False, sort=False).sum().reset_index()
+        return True
+
+
+class LiveAnalyzer:
+
+    def __init__(self,
+                 run_dir: Path | str,
+                 scheduler: Scheduler,
+                 config: Optional[str] = None,
+                 interval: float = 60.0,
+                 window: int = 100,
+                 ep_bucket: int = 100) -> None:
+        self.logger = logger.getChild(__class__.__name__)
+        self.run_dir = Path(run_dir)
+        self.scheduler = scheduler
+        # chick data config for the full analysis once the last job finishes, None to skip it
+        self.config = config
+        # seconds between updates, and the number of recent train episodes a score averages over
+        self.interval = interval
+        self.window = window
+        self.ep_bucket = ep_bucket
+        self.output_dir = self.run_dir.joinpath("results", "live")
+
+        self.tails: dict[Path, LogTail] = {}
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._thread = threading.Thread(target=self._run, name="nett-live-analyzer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def update(self) -> pd.DataFrame:
+        with self._lock:
+            for path in self.run_dir.glob("*/brain_*/env_logs/**/*.csv"):
+                if log_phase(path) is not None and path not in self.tails:
+                    self.tails[path] = LogTail(path)
+            updated = [tail for tail in self.tails.values() if tail.update()]
+
+            scores = self.scores()
+            if updated:
+                self.output_dir.mkdir(parents=True, exist_ok=True)
+                scores.to_csv(self.output_dir.joinpath("scores.csv"), index=False)
+                train_data = self._episodes("train")
+                if not train_data.empty:
+                    plot_train(train_data, self.output_dir, self.ep_bucket, int(train_data["Episode"].max()) + 1)
+            return scores
+
+    def scores(self) -> pd.DataFrame:
+        # imprinting score per brain, over the last `window` train episodes and every test episode so far
+        with self._lock:
+            rows = []
+            for phase in ("train", "test"):
+                data = self._episodes(phase)
+                if data.empty:
+                    continue
+                data = percent_correct(data).sort_values("Episode")
+                for (condition, brain_id), brain_data in data.groupby(["condition", "brain_id"]):
+                    recent = brain_data.tail(self.window) if phase == "train" else brain_data
+                    rows.append({
+                        "phase": phase,
+                        "condition": condition,
+                        "brain_id": brain_id,
+                        "episodes": len(brain_data),
+                        "percent_correct": recent["percent_correct"].mean()
+                    })
+            return pd.DataFrame(rows, columns=["phase", "condition", "brain_id", "episodes", "percent_correct"])
+
+    def _episodes(self, phase: str) -> pd.DataFrame:
+        frames = []
+        for path, tail in self.tails.items():
+            if log_phase(path) == phase and tail.episodes is not None:
+                condition, brain_id = partition(path, self.run_dir)
+                frames.append(tail.episodes.assign(condition=condition, brain_id=brain_id))
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+    def _run(self) -> None:
+        try:
+            while not self._stop.is_set():
+                # checked before updating, so that the last update sees every finished log
+                finished = self.scheduler.finished
+                self.update()
+                if finished:
+                    self._finalize()
+                    return
+                self._stop.wait(self.interval)
+        except Exception as e:
+            # analysis must never take the run down with it
+            self.logger.exception(f"Live analysis stopped with error: {e}")
+
+    def _finalize(self) -> None:
+        self.logger.info(f"All jobs finished, live scores at {self.output_dir}")
+        if self.config is not None:
+            analyze(self.config, self.run_dir)
@@ -0,0 +1,112 @@
+import threading
+from pathlib import Path
+from typing import Any, Optional
+
+from nett import logger
+
+
+class LogSink:
+
+    def __init__(self,
+                 path: Path | str,
+                 flush_lines: int = 4096,
+                 flush_interval: float = 5.0,
+                 parquet: bool = False) -> None:
+        self.logger = logger.getChild(__class__.__name__)
+        # path without suffix, the CSV (and Parquet) files are written next to each other
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # flush once this many lines are buffered, or after flush_interval seconds, whichever comes first
+        self.flush_lines = flush_lines
+        self.flush_interval = flush_interval
+
+        # appended rather than replaced, log titles can contain dots
+        self._file = open(self.path.with_name(f"{self.path.name}.csv"), "w", buffering=1 << 20)
+        self._parquet = _ParquetWriter(self.path.with_name(f"{self.path.name}.parquet")) if parquet else None
+        self._buffer: list[str] = []
+        self._lock = threading.Lock()
+        # serializes flushes from the writer thread and from close()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name=f"nett-log-{self.path.name}", daemon=True)
+        self._thread.start()
+
+    def write(self, line: str) -> None:
+        with self._lock:
+            if self._closed:
+                raise ValueError(f"Log sink {self.path} is closed")
+            self._buffer.append(line)
+            full = len(self._buffer) >= self.flush_lines
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> None:
+        with self._flush_lock:
+            with self._lock:
+                lines, self._buffer = self._buffer, []
+            if not lines:
+                return
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+            if self._parquet is not None:
+                self._parquet.write(lines)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        # whatever the writer thread did not pick up before stopping
+        self.flush()
+        self._file.close()
+        if self._parquet is not None:
+            self._parquet.close()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # keep buffering, the next flush or close() retries the write
+                self.logger.exception(f"Failed to flush logs to {self.path}: {e}")
+
+
+class _ParquetWriter:
+
+    def __init__(self, path: Path) -> None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError("Writing Parquet logs requires pyarrow. Install it with 'pip install pyarrow' or disable parquet logging.") from e
+        self._pa = pyarrow
+        self._pq = pyarrow.parquet
+        self.path = path
+        # the first line logged by Unity is the CSV header, every column is stored as a string
+        self._columns: Optional[list[str]] = None
+        self._writer: Any = None
+
+    def write(self, lines: list[str]) -> None:
+        if self._columns is None:
+            self._columns, lines = lines[0].split(","), lines[1:]
+            schema = self._pa.schema([(column, self._pa.string()) for column in self._columns])
+            self._writer = self._pq.ParquetWriter(self.path, schema)
+        if not lines:
+            return
+        # one row group per flush, short or long rows are padded or truncated to the header
+        rows = [(line.split(",") + [None] * len(self._columns))[:len(self._columns)] for line in lines]
+        columns = {column: [row[i] for row in rows] for i, column in enumerate(self._columns)}
+        self._writer.write_table(self._pa.table(columns, schema=self._writer.schema))
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
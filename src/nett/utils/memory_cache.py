@@ -0,0 +1,71 @@
+import os
+import json
+import hashlib
+from pathlib import Path
+from typing import Any, Optional
+from importlib import metadata
+
+from nett import cache_dir, logger
+
+# packages whose upgrades can change the memory footprint of a job
+_VERSIONED_PACKAGES = ("nett-benchmarks-fork", "torch", "stable-baselines3", "sb3-contrib", "mlagents-envs")
+
+
+def fingerprint(config: dict[str, Any]) -> str:
+    # stable across processes and sessions, unlike hash()
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def package_versions() -> dict[str, str]:
+    versions = {}
+    for package in _VERSIONED_PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = "unknown"
+    return versions
+
+
+class JobMemoryCache:
+
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.logger = logger.getChild(__class__.__name__)
+        self.path = Path(path) if path is not None else cache_dir.joinpath("job_memory.json")
+
+    def get(self, config: dict[str, Any]) -> Optional[dict[str, int | str]]:
+        entry = self._read().get(fingerprint(config))
+        if entry is None or "profile" not in entry:
+            return None
+        # estimates measured with other package versions are stale
+        if entry.get("versions") != package_versions():
+            self.logger.info("Cached job memory was measured with different package versions, ignoring it")
+            return None
+        return entry["profile"]
+
+    def set(self, config: dict[str, Any], profile: dict[str, int | str]) -> None:
+        # the profile holds the measured footprint, its "peak" is what jobs are scheduled with
+        entries = self._read()
+        entries[fingerprint(config)] = {"profile": profile, "versions": package_versions(), "config": config}
+        self._write(entries)
+
+    def clear(self) -> None:
+        if self.path.exists():
+            self.path.unlink()
+
+    def _read(self) -> dict[str, dict[str, Any]]:
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError:
+            self.logger.warning(f"Job memory cache at {self.path} is corrupt, starting a new one")
+            return {}
+
+    def _write(self, entries: dict[str, dict[str, Any]]) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first so that concurrent readers never see a partial file
+        tmp_path = self.path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w") as file:
+            json.dump(entries, file, indent=2, default=str)
+        os.replace(tmp_path, self.path)
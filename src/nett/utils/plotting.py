@@ -0,0 +1,51 @@
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+# an explicit Figure renders with Agg and is not tracked by pyplot, so it is freed once it goes out of scope
+from matplotlib.figure import Figure
+
+from nett import logger
+from nett.utils.train import moving_average
+
+# same smoothing window as stable_baselines3.common.results_plotter
+EPISODES_WINDOW = 100
+
+_plotter: Optional[ThreadPoolExecutor] = None
+_plotter_lock = threading.Lock()
+
+
+def plot_rewards(timesteps: list[int], rewards: list[float], iterations: int, path: Path, title: str) -> None:
+    timesteps, rewards = np.asarray(timesteps), np.asarray(rewards, dtype=float)
+    fig = Figure(figsize=(8, 2))
+    ax = fig.subplots()
+    ax.scatter(timesteps, rewards, s=2)
+    if len(rewards) >= EPISODES_WINDOW:
+        # the average is plotted at the last episode of each window
+        ax.plot(timesteps[EPISODES_WINDOW - 1:], moving_average(rewards, EPISODES_WINDOW))
+    ax.set_xlim(min(timesteps, default=0), iterations)
+    ax.set_title(title)
+    ax.set_xlabel("Timesteps")
+    ax.set_ylabel("Episode Rewards")
+    fig.tight_layout()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(path)
+
+
+def submit_plot(fn: Callable[..., None], *args: Any) -> Future:
+    # plots of every job in this process are drawn one at a time on a background thread,
+    # which the interpreter waits for before the process exits
+    global _plotter
+    with _plotter_lock:
+        if _plotter is None:
+            _plotter = ThreadPoolExecutor(max_workers=1, thread_name_prefix="nett-plotter")
+    future = _plotter.submit(fn, *args)
+    future.add_done_callback(_log_error)
+    return future
+
+
+def _log_error(future: Future) -> None:
+    if future.exception() is not None:
+        logger.getChild("plotting").error(f"Failed to plot: {future.exception()!r}")
@@ -0,0 +1,90 @@
+import os
+import json
+import fcntl
+import tempfile
+from pathlib import Path
+from contextlib import contextmanager
+from typing import IO, Iterator, Optional
+
+from nett import logger
+from nett.utils.unity_socket import port_in_use
+
+# shared by every nett process on the node, so that concurrent runs never hand out the same ports
+_REGISTRY_PATH = Path(tempfile.gettempdir()).joinpath("nett-ports.json")
+
+
+class PortAllocator:
+
+    def __init__(self, base_port: int, max_port: int = 65535, registry_path: Optional[Path] = None) -> None:
+        self.logger = logger.getChild(__class__.__name__)
+        self.base_port = base_port
+        self.max_port = max_port
+        self.registry_path = Path(registry_path) if registry_path is not None else _REGISTRY_PATH
+
+    def reserve(self, num_ports: int = 1) -> list[int]:
+        # reserve the lowest block of consecutive free ports, atomically with respect to other processes
+        with self._locked() as registry:
+            port = self.base_port
+            while port + num_ports - 1 <= self.max_port:
+                block = range(port, port + num_ports)
+                taken = next((p for p in block if str(p) in registry or port_in_use(p)), None)
+                if taken is None:
+                    for p in block:
+                        registry[str(p)] = os.getpid()
+                    return list(block)
+                # skip past the port that is taken
+                port = taken + 1
+        raise RuntimeError(f"No block of {num_ports} free ports between {self.base_port} and {self.max_port}")
+
+    def release(self, ports: list[int]) -> None:
+        with self._locked() as registry:
+            for port in ports:
+                registry.pop(str(port), None)
+
+    def reserved(self) -> dict[int, int]:
+        with self._locked() as registry:
+            return {int(port): pid for port, pid in registry.items()}
+
+    @contextmanager
+    def _locked(self) -> Iterator[dict[str, int]]:
+        # the registry is its own lock file, readable and writable by every user on the node
+        fd = os.open(self.registry_path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            # undo the umask, only possible for the user that created the registry
+            os.fchmod(fd, 0o666)
+        except PermissionError:
+            pass
+        with os.fdopen(fd, "r+") as file:
+            fcntl.flock(file, fcntl.LOCK_EX)
+            try:
+                registry = self._read(file)
+                # reclaim ports from processes that exited without releasing them
+                registry = {port: pid for port, pid in registry.items() if _pid_alive(pid)}
+                yield registry
+                file.seek(0)
+                file.truncate()
+                json.dump(registry, file)
+                file.flush()
+            finally:
+                fcntl.flock(file, fcntl.LOCK_UN)
+
+    def _read(self, file: IO[str]) -> dict[str, int]:
+        content = file.read()
+        if not content:
+            return {}
+        try:
+            return json.loads(content)
+        except json.JSONDecodeError:
+            self.logger.warning(f"Port registry at {self.registry_path} is corrupt, starting a new one")
+            return {}
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        # the process exists but belongs to another user
+        return True
+    return True
@@ -0,0 +1,30 @@
+from pathlib import Path
+
+
+def process_tree(pid: int) -> list[int]:
+    # a process and all of its descendants, e.g. the environment workers and Unity executables
+    children: dict[int, list[int]] = {}
+    for stat_path in Path("/proc").glob("[0-9]*/stat"):
+        try:
+            # the parent pid is the second field after the parenthesized command name
+            ppid = int(stat_path.read_text().rsplit(")", 1)[1].split()[1])
+        except (FileNotFoundError, ProcessLookupError, IndexError, ValueError):
+            # the process exited while being read
+            continue
+        children.setdefault(ppid, []).append(int(stat_path.parent.name))
+
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def process_rss(pid: int) -> int:
+    # resident memory of a single process, in bytes
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            return next((int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:")), 0)
+    except (FileNotFoundError, ProcessLookupError):
+        return 0
@@ -0,0 +1,296 @@
+import os
+import threading
+from collections import deque
+from typing import Callable, Final, NamedTuple, Optional, Protocol
+from concurrent.futures import (
+    Executor,
+    Future,
+    wait as future_wait,
+    FIRST_COMPLETED
+)
+
+from pynvml import (
+    NVMLError,
+    nvmlInit,
+    nvmlDeviceGetCount,
+    nvmlDeviceGetHandleByIndex,
+    nvmlDeviceGetMemoryInfo,
+    nvmlDeviceGetComputeRunningProcesses,
+    nvmlDeviceGetGraphicsRunningProcesses
+)
+
+from nett import logger
+from nett.utils.job import Job
+from nett.utils.port_allocator import PortAllocator
+from nett.utils.processes import process_rss, process_tree
+
+
+class MemoryStatus(NamedTuple):
+    free: int
+    used: int
+    total: int
+
+
+class MemoryProbe(Protocol):
+    # anything that can report live memory for a set of devices, e.g. NVML or a fake for testing
+    # devices that share memory report the same pool, max_jobs_per_device caps jobs per device (None for no cap)
+    max_jobs_per_device: Optional[int]
+
+    def device_count(self) -> int: ...
+
+    def memory(self, device: int) -> MemoryStatus: ...
+
+    # memory used by this process and its descendants (job workers, Unity executables), None if it cannot be attributed
+    def own_usage(self, device: int) -> Optional[int]: ...
+
+    def pool(self, device: int) -> int | str: ...
+
+
+class NvmlProbe:
+
+    max_jobs_per_device: Optional[int] = None
+
+    def __init__(self) -> None:
+        self._initialized = False
+
+    def device_count(self) -> int:
+        self._initialize()
+        return nvmlDeviceGetCount()
+
+    def memory(self, device: int) -> MemoryStatus:
+        self._initialize()
+        info = nvmlDeviceGetMemoryInfo(nvmlDeviceGetHandleByIndex(device))
+        return MemoryStatus(free=info.free, used=info.used, total=info.total)
+
+    def own_usage(self, device: int) -> Optional[int]:
+        self._initialize()
+        handle = nvmlDeviceGetHandleByIndex(device)
+        try:
+            processes = nvmlDeviceGetComputeRunningProcesses(handle) + nvmlDeviceGetGraphicsRunningProcesses(handle)
+        except NVMLError:
+            return None
+        pids = set(process_tree(os.getpid()))
+        # the same process can be listed as both compute and graphics
+        used = {process.pid: process.usedGpuMemory for process in processes if process.pid in pids}
+        # per-process usage is not available in some containers
+        if None in used.values():
+            return None
+        return sum(used.values())
+
+    def pool(self, device: int) -> int:
+        return device
+
+    def _initialize(self) -> None:
+        # NVML is only touched once a probe is actually used
+        if not self._initialized:
+            nvmlInit()
+            self._initialized = True
+
+
+class CpuProbe:
+
+    # every device is a worker slot that runs one job at a time
+    max_jobs_per_device: Optional[int] = 1
+    # default number of cores given to each worker slot
+    THREADS_PER_SLOT: Final = 4
+    MEMINFO_PATH: str = "/proc/meminfo"
+
+    def __init__(self, num_slots: Optional[int] = None) -> None:
+        self.num_cores: int = len(os.sched_getaffinity(0))
+        self.num_slots: int = num_slots or max(1, self.num_cores // self.THREADS_PER_SLOT)
+
+    @property
+    def threads_per_slot(self) -> int:
+        # partition the cores so that concurrent jobs do not oversubscribe them
+        return max(1, self.num_cores // self.num_slots)
+
+    def device_count(self) -> int:
+        return self.num_slots
+
+    def memory(self, device: int) -> MemoryStatus:
+        # all worker slots share the host memory
+        meminfo = {}
+        with open(self.MEMINFO_PATH) as f:
+            for line in f:
+                key, value = line.split(":", 1)
+                meminfo[key] = int(value.split()[0]) * 1024
+        total, free = meminfo["MemTotal"], meminfo["MemAvailable"]
+        return MemoryStatus(free=free, used=total - free, total=total)
+
+    def own_usage(self, device: int) -> Optional[int]:
+        return sum(process_rss(pid) for pid in process_tree(os.getpid()))
+
+    def pool(self, device: int) -> str:
+        return "host"
+
+
+class Scheduler:
+
+    def __init__(self,
+                 devices: list[int],
+                 job_memory: int,
+                 probe: MemoryProbe,
+                 base_port: int,
+                 poll_interval: float = 1.0,
+                 memory_profile: Optional[dict[str, int | str]] = None) -> None:
+        self.logger = logger.getChild(__class__.__name__)
+        self.devices = devices
+        self.job_memory = job_memory
+        # measured footprint of a single job (rollout buffer, model, optimizer, peak), if it was estimated
+        self.memory_profile = memory_profile
+        self.probe = probe
+        self.poll_interval = poll_interval
+
+        # jobs waiting for a device, jobs that have been submitted and jobs still running
+        self.queue: deque[Job] = deque()
+        self.job_sheet: dict[Future, Job] = {}
+        self.running: dict[Future, Job] = {}
+
+        # memory pools, devices sharing memory (e.g. CPU worker slots) share a pool
+        self.pools: dict[int, int | str] = {device: self.probe.pool(device) for device in devices}
+        # memory promised to running jobs that may not have allocated it yet, per pool
+        self.reserved: dict[int | str, int] = {pool: 0 for pool in self.pools.values()}
+        # memory used by other processes the last time nothing of this scheduler ran on the pool,
+        # only used when the probe cannot tell this scheduler's memory apart from theirs
+        self.baseline: dict[int | str, int] = {pool: self.probe.memory(device).used for device, pool in self.pools.items()}
+
+        # ports are reserved on the node for the lifetime of each job, ports of finished jobs are reused
+        self.ports = PortAllocator(base_port)
+
+        self._lock = threading.RLock()
+        self._thread: Optional[threading.Thread] = None
+        self._reported_depth: Optional[int] = None
+        # the error that stopped the scheduler, queued jobs will never be launched once it is set
+        self.error: Optional[BaseException] = None
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self.queue)
+
+    @property
+    def finished(self) -> bool:
+        # every job was launched and has completed, or the scheduler stopped and nothing is left running
+        with self._lock:
+            if self.error is not None:
+                return all(future.done() for future in self.job_sheet)
+            return not self.queue and all(future.done() for future in self.job_sheet)
+
+    def submit(self, jobs: list[Job]) -> None:
+        with self._lock:
+            self.queue.extend(jobs)
+
+    def headroom(self, device: int) -> int:
+        # live free memory, capped by what is left once every running job reaches its full footprint
+        pool = self.pools[device]
+        status = self.probe.memory(device)
+        own = self.probe.own_usage(device)
+        if own is None:
+            if not any(self.pools[job.device] == pool for job in self.running.values()):
+                self.baseline[pool] = status.used
+            outside, own = self.baseline[pool], 0
+        else:
+            # measured on every poll, so memory freed by other processes is reclaimed
+            outside = max(0, status.used - own)
+        # jobs that outgrow their reservation count with what they actually use
+        return min(status.free, status.total - outside - max(self.reserved[pool], own))
+
+    def jobs_on(self, device: int) -> int:
+        return sum(job.device == device for job in self.running.values())
+
+    def utilization(self) -> dict[int, dict[str, float | int]]:
+        utilization = {}
+        for device in self.devices:
+            status = self.probe.memory(device)
+            utilization[device] = {
+                "used": status.used,
+                "total": status.total,
+                "reserved": self.reserved[self.pools[device]],
+                "jobs": self.jobs_on(device),
+                "utilization": status.used / status.total if status.total else 0.0
+            }
+        return utilization
+
+    def launch(self, executor: Executor, fn: Callable[[Job], str], wait: bool) -> dict[Future, Job]:
+        # check up front that at least one job fits, so the caller gets the error directly
+        if self.queue and self._place() is None:
+            raise ValueError("No jobs could be scheduled. Job size too large for the devices. If job_memory='auto', consider setting buffer to 1. Otherwise, consider setting job_memory to a value less than or equal to total free device memory / buffer.")
+
+        if wait:
+            self._run(executor, fn, wait)
+        else:
+            # keep backfilling in the background and return control to the user
+            self._thread = threading.Thread(target=self._run, args=(executor, fn, wait), name="nett-scheduler")
+            self._thread.start()
+        return self.job_sheet
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        if self._thread is not None:
+            self._thread.join(timeout)
+        # errors of the background thread reach the caller here
+        if self.error is not None:
+            raise self.error
+
+    def _run(self, executor: Executor, fn: Callable[[Job], str], wait: bool) -> None:
+        try:
+            while self.queue or (wait and self.running):
+                self._dispatch(executor, fn)
+                with self._lock:
+                    pending = list(self.running)
+                    # nothing is running that could free up room for the rest of the queue
+                    if not pending and self.queue and self._place() is None:
+                        raise ValueError(f"{self.queue_depth} jobs could not be scheduled on devices {self.devices}.")
+                # wake up when a job finishes, or poll again in case memory was freed elsewhere
+                future_wait(pending, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+        except Exception as e:
+            self.error = e
+            self.logger.exception(f"Scheduler stopped with error: {e}, {self.queue_depth} jobs will not be launched")
+            # in the background, the error is kept for join(), finished and NETT.status()
+            if wait:
+                raise e
+
+    def _dispatch(self, executor: Executor, fn: Callable[[Job], str]) -> int:
+        launched = 0
+        with self._lock:
+            while self.queue:
+                device = self._place()
+                if device is None:
+                    if self.running and self._reported_depth != self.queue_depth:
+                        self.logger.info(f"No device has room, {self.queue_depth} jobs queued until one frees up.")
+                        self._reported_depth = self.queue_depth
+                    break
+                job = self.queue.popleft()
+                job.device = device
+                ports = self.ports.reserve(Job.num_envs)
+                job.port = ports[0]
+                self.reserved[self.pools[device]] += self.job_memory
+                self.logger.info(f"Assigning device {device} to job {job.condition}-{job.brain_id}")
+                try:
+                    future = executor.submit(fn, job)
+                except Exception:
+                    # e.g. a shut down or broken executor, the job never started so it goes back to the queue
+                    self.ports.release(ports)
+                    self.reserved[self.pools[device]] -= self.job_memory
+                    self.queue.appendleft(job)
+                    raise
+                self.job_sheet[future] = job
+                self.running[future] = job
+                # release the job's memory and ports as soon as it finishes, even after the queue has drained
+                future.add_done_callback(self._release)
+                launched += 1
+        return launched
+
+    def _place(self) -> Optional[int]:
+        # best fit: the device with the least headroom that can still hold a job keeps the others free
+        max_jobs = self.probe.max_jobs_per_device
+        candidates = [
+            (headroom, device) for device in self.devices
+            if (max_jobs is None or self.jobs_on(device) < max_jobs) and (headroom := self.headroom(device)) >= self.job_memory
+        ]
+        return min(candidates)[1] if candidates else None
+
+    def _release(self, future: Future) -> None:
+        with self._lock:
+            job = self.running.pop(future)
+            self.reserved[self.pools[job.device]] -= self.job_memory
+            self.ports.release(job.ports)
+
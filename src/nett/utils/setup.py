@@ -0,0 +1,60 @@
+import os
+import json
+import stat
+import hashlib
+from pathlib import Path
+from functools import cache
+from typing import Optional
+
+from nett import cache_dir, logger
+
+# shared by every user of the node, ml-agents fails to import if they are not world-writable
+_MLAGENTS_DIRS = ("/tmp/ml-agents-binaries", "/tmp/ml-agents-binaries/binaries", "/tmp/ml-agents-binaries/tmp")
+_EXECUTABLE_MODE = 0o755
+
+
+def setup(executable_path: Optional[str] = None) -> None:
+    # one-time preparation of the node, and of the Unity executable if given, cheap to call again
+    setup_mlagents_dirs()
+    if executable_path is not None:
+        setup_executable(executable_path)
+
+
+@cache
+def setup_mlagents_dirs() -> None:
+    for tmp_dir in _MLAGENTS_DIRS:
+        try:
+            os.makedirs(tmp_dir, exist_ok=True)
+        except PermissionError:
+            logger.warning(f"You do not have permission to create '{tmp_dir}'.")
+            continue
+        if stat.S_IMODE(os.stat(tmp_dir).st_mode) % 0o1000 != 0o777:
+            if os.stat(tmp_dir).st_uid == os.getuid() or os.access(tmp_dir, os.W_OK):
+                os.chmod(tmp_dir, 0o1777)
+            else:
+                logger.warning(f"You do not have permission to change the necessary files in '{tmp_dir}'.")
+
+
+@cache
+def setup_executable(executable_path: str) -> None:
+    path = Path(executable_path).resolve()
+    # the marker remembers the build whose permissions were checked, a new build changes its mtime
+    marker = cache_dir.joinpath("setup", f"{hashlib.sha256(str(path).encode()).hexdigest()}.json")
+    stamp = {"path": str(path), "mtime_ns": path.stat().st_mtime_ns}
+    try:
+        if json.loads(marker.read_text()) == stamp and os.access(path, os.X_OK):
+            return
+    except (FileNotFoundError, json.JSONDecodeError):
+        pass
+
+    if stat.S_IMODE(path.stat().st_mode) != _EXECUTABLE_MODE:
+        try:
+            os.chmod(path, _EXECUTABLE_MODE)
+            logger.info("Executable permission is set")
+        except PermissionError:
+            # a build owned by another user is fine as long as it can be run
+            if not os.access(path, os.X_OK):
+                raise PermissionError(f"{path} is not executable and you do not have permission to change it.")
+
+    marker.parent.mkdir(parents=True, exist_ok=True)
+    marker.write_text(json.dumps(stamp))
@@ -1,28 +1,25 @@
 import os
 import glob
+import warnings
+from typing import Iterator, Optional
+
 import numpy as np
 import pandas as pd
 
-def compute_train_performance(path) -> tuple[list, np.ndarray | list]:
+def compute_train_performance(path, window: int = 100) -> tuple[list, np.ndarray | list]:
+    warnings.warn("compute_train_performance only scores the first CSV file, use learning_curves instead", DeprecationWarning, stacklevel=2)
 
     x,y = [], []
     try:
+        # any CSV file, as before learning_curves() existed
         training_files = glob.glob(os.path.join(path, "*.csv"))
 
         if len(training_files) == 0:
             raise Exception(f"Training file: {training_files} was not found in the {path}")
 
-
-        for file_name in training_files:
-
-            log_df = pd.read_csv(file_name, skipinitialspace=True)
-
-            _, _, values = average_in_episode_three_region(log_df,"agent.x") # percents,df,
-            y = moving_average(values, window=100)
-            x = list(range(len(y)))
-
-            break
-
+        # the curve of the first file found, see learning_curves() for every training file
+        y = learning_curve(training_files[0], windows=(window,))[window]
+        x = list(range(len(y)))
 
         return x, y
     except Exception as ex:
@@ -30,26 +27,70 @@ def compute_train_performance(path) -> tuple[list, np.ndarray | list]:
 
     return x,y
 
+def learning_curves(path, windows: tuple[int, ...] = (100,), pattern: str = "*train.csv") -> dict[str, dict[int, np.ndarray]]:
+    # moving averages of the episode scores of every training file in the directory, for each window size
+    training_files = sorted(glob.glob(os.path.join(path, pattern)))
+    if len(training_files) == 0:
+        raise FileNotFoundError(f"No training files matching {pattern} were found in {path}")
+    return {file_name: learning_curve(file_name, windows) for file_name in training_files}
+
+def learning_curve(file_name: str, windows: tuple[int, ...] = (100,), column: str = 'agent.x', transient: int = 90, chunksize: int = 1_000_000) -> dict[int, np.ndarray]:
+    # one pass over the log, keeping only the current chunk and the last max(windows) scores in memory
+    curve = LearningCurve(windows)
+    for _, score in iter_episode_scores(file_name, column, transient, chunksize):
+        curve.update(score)
+    return curve.curves()
+
+class MovingAverage:
+
+    def __init__(self, window: int) -> None:
+        if window < 1:
+            raise ValueError(f"window should be a positive integer, got {window}")
+        self.window = window
+        # ring buffer of the last `window` values and their running sum
+        self._values = np.zeros(window)
+        self._sum = 0.0
+        self._count = 0
+
+    def update(self, value: float) -> Optional[float]:
+        # the average of the last `window` values, None until the window is full
+        i = self._count % self.window
+        self._sum += value - self._values[i]
+        self._values[i] = value
+        self._count += 1
+        if i == self.window - 1:
+            # resum once per window so rounding errors do not accumulate
+            self._sum = float(self._values.sum())
+        return self._sum / self.window if self._count >= self.window else None
+
+class LearningCurve:
+
+    def __init__(self, windows: tuple[int, ...] = (100,)) -> None:
+        self.averages = {window: MovingAverage(window) for window in windows}
+        self._curves: dict[int, list[float]] = {window: [] for window in windows}
+
+    def update(self, score: float) -> None:
+        for window, average in self.averages.items():
+            value = average.update(score)
+            if value is not None:
+                self._curves[window].append(value)
+
+    def curves(self) -> dict[int, np.ndarray]:
+        # same values as moving_average() over all scores seen so far
+        return {window: np.array(values) for window, values in self._curves.items()}
+
+# the chamber is 20 units wide, centered on 0, and split into thirds
+REGION_EDGES = np.array([-0.1, 20/3, 40/3, 20.1])
+REGION_LABELS = ["Distractor", "Null", "Imprint"]
+
 def average_in_episode_three_region(log: pd.DataFrame, column: str = 'agent.x', transient: int = 90) -> tuple[dict, pd.DataFrame, list]:
     try:
-        log.loc[log.Episode % 2 == 1, column] *= -1
-        #Translate coordinates
-        log[column] += 10
-        #Bin into 3 sections
-        log[column] = pd.cut(log[column], [-0.1,20/3,40/3,20.1],labels=["Distractor","Null","Imprint"])
-        episodes = log.Episode.unique()
-        percents = {}
-        for ep in episodes:
-            #Get success percentage
-            l = log[log["Episode"]==ep]
-            l = l[l["Step"]>transient]
-            total = l[l[column]=="Distractor"].count() + l[l[column]=="Imprint"].count()
-            success = l[l[column]=="Imprint"].count()/total
-            percents[ep] = success[column]
-
-            if np.isnan(percents[ep]):
-                percents[ep] = 0.5
+        regions = _three_regions(log["Episode"].to_numpy(), log[column].to_numpy(dtype=float))
+        episodes, imprint, distractor = _count_regions(log["Episode"].to_numpy(), log["Step"].to_numpy(), regions, transient)
+        #Bin into 3 sections, -1 is outside the chamber
+        log[column] = pd.Categorical.from_codes(regions, categories=REGION_LABELS)
 
+        percents = dict(zip(episodes.tolist(), _success_rates(imprint, distractor).tolist()))
         rv = list(percents.values())
 
         return (percents,log,rv)
@@ -57,6 +98,72 @@ def average_in_episode_three_region(log: pd.DataFrame, column: str = 'agent.x',
         print(str(ex))
         return (None, None, None)
 
+def average_in_episode_three_region_chunked(path: str, column: str = 'agent.x', transient: int = 90, chunksize: int = 1_000_000) -> tuple[dict, list]:
+    # same scores as average_in_episode_three_region, reading the log in chunks to bound memory
+    try:
+        imprint, distractor = {}, {}
+        for chunk in pd.read_csv(path, skipinitialspace=True, usecols=["Episode", "Step", column], chunksize=chunksize):
+            episode = chunk["Episode"].to_numpy()
+            regions = _three_regions(episode, chunk[column].to_numpy(dtype=float))
+            episodes, chunk_imprint, chunk_distractor = _count_regions(episode, chunk["Step"].to_numpy(), regions, transient)
+            # an episode can span chunks, its counts add up
+            for ep, i, d in zip(episodes.tolist(), chunk_imprint.tolist(), chunk_distractor.tolist()):
+                imprint[ep] = imprint.get(ep, 0) + i
+                distractor[ep] = distractor.get(ep, 0) + d
+
+        rates = _success_rates(np.array(list(imprint.values())), np.array(list(distractor.values())))
+        percents = dict(zip(imprint.keys(), rates.tolist()))
+        return (percents, list(percents.values()))
+    except Exception as ex:
+        print(str(ex))
+        return (None, None)
+
+def iter_episode_scores(path: str, column: str = 'agent.x', transient: int = 90, chunksize: int = 1_000_000) -> Iterator[tuple[int, float]]:
+    # (episode, score) as soon as each episode ends, assuming the steps of an episode are contiguous in the log
+    pending: Optional[list] = None
+    for chunk in pd.read_csv(path, skipinitialspace=True, usecols=["Episode", "Step", column], chunksize=chunksize):
+        episode = chunk["Episode"].to_numpy()
+        regions = _three_regions(episode, chunk[column].to_numpy(dtype=float))
+        episodes, imprint, distractor = _count_regions(episode, chunk["Step"].to_numpy(), regions, transient)
+        for ep, i, d in zip(episodes.tolist(), imprint.tolist(), distractor.tolist()):
+            # the last episode of the previous chunk may continue in this one
+            if pending is not None and pending[0] == ep:
+                pending[1] += i
+                pending[2] += d
+                continue
+            if pending is not None:
+                yield pending[0], float(_success_rates(np.array(pending[1]), np.array(pending[2])))
+            pending = [ep, i, d]
+    if pending is not None:
+        yield pending[0], float(_success_rates(np.array(pending[1]), np.array(pending[2])))
+
+def _three_regions(episode: np.ndarray, x: np.ndarray) -> np.ndarray:
+    # mirror odd episodes so the imprint side is always on the right, then translate to [0, 20]
+    x = np.where(episode % 2 == 1, -x, x) + 10
+    # right-closed bins like pd.cut, positions outside the chamber (or NaN) map to -1
+    regions = np.searchsorted(REGION_EDGES, x, side="left") - 1
+    regions[(regions < 0) | (regions >= len(REGION_LABELS)) | np.isnan(x)] = -1
+    return regions
+
+def _count_regions(episode: np.ndarray, step: np.ndarray, regions: np.ndarray, transient: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # episodes in order of appearance, with their imprint and distractor counts after the transient
+    codes, episodes = pd.factorize(episode)
+    settled = step > transient
+    imprint = np.bincount(codes[settled & (regions == 2)], minlength=len(episodes))
+    distractor = np.bincount(codes[settled & (regions == 0)], minlength=len(episodes))
+    return np.asarray(episodes), imprint, distractor
+
+def _success_rates(imprint: np.ndarray, distractor: np.ndarray) -> np.ndarray:
+    total = imprint + distractor
+    # episodes that never left the middle score chance
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, imprint / total, 0.5)
+
 def moving_average(values: list, window: int) -> np.ndarray:
-    weights: np.ndarray = np.repeat(1.0, window) / window
-    return np.convolve(values, weights, 'valid')
+    # np.convolve(values, np.ones(window) / window, 'valid') in O(n) with a cumulative sum,
+    # except that fewer values than the window give no averages instead of a convolution over the window
+    values = np.asarray(values, dtype=float)
+    if len(values) < window:
+        return np.array([])
+    cumsum = np.cumsum(np.insert(values, 0, 0.0))
+    return (cumsum[window:] - cumsum[:-window]) / window
@@ -7,29 +7,29 @@ from mlagents_envs.side_channel.side_channel import (
     OutgoingMessage,
 )
 
+from nett.utils.log_sink import LogSink
+
 
 def port_in_use(port) -> bool:
-    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    try:
-        sock.bind(("localhost", port))
-    except socket.error:
-        return True
+    # the socket is closed again right away so that probing does not hold on to the port
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        try:
+            sock.bind(("localhost", port))
+        except socket.error:
+            return True
     return False
 
 # Create the StringLogChannel class. This is how logging info is communicated between python and unity
 class UnitySocket(SideChannel):
-    def __init__(self, log_title, log_dir="./EnvLogs/") -> None:
+    def __init__(self, log_title, log_dir="./EnvLogs/", parquet: bool = False) -> None:
         super().__init__(uuid.UUID("621f0a70-4f87-11ea-a6bf-784f4387d1f7"))
-        if not os.path.exists(log_dir):
-            os.makedirs(log_dir)
         self.log_dir = log_dir
-        f_name = os.path.join(log_dir, f"{log_title}.csv")
-        self.f = open(f_name, "w")
+        # messages arrive once per Unity step, so they are batched and written from a background thread
+        self.sink = LogSink(os.path.join(log_dir, log_title), parquet=parquet)
 
     #Method from Sidechannel interface.
     def on_message_received(self, msg: IncomingMessage) -> None:
-        self.f.write(msg.read_string()) #Write message to log file
-        self.f.write("\n") #add new line character
+        self.sink.write(msg.read_string()) #Write message to log file
 
     #This is here because it is required and I currently don"t use it.
     def send_string(self, data: str) -> None:
@@ -39,8 +39,13 @@ class UnitySocket(SideChannel):
         super().queue_message_to_send(msg)
 
     def log_str(self, msg: str) -> None:
-        self.f.write(msg)
-        self.f.write("\n")
+        self.sink.write(msg)
+
+    def close(self) -> None:
+        # flushes everything still buffered, called when the environment closes
+        self.sink.close()
 
     def __del__(self) -> None:
-        self.f.close()
+        # the sink is missing if it could not be opened
+        if hasattr(self, "sink"):
+            self.close()
@@ -0,0 +1,20 @@
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+pytest.importorskip("stable_baselines3")
+from nett.utils.callbacks.checkpoint_callback import AsyncCheckpointCallback
+
+
+def test_replay_buffer_is_named_after_its_checkpoint():
+    path = Path("checkpoints/rl_model_30000_steps.pt")
+    assert AsyncCheckpointCallback._replay_buffer_path(path) == Path("checkpoints/rl_model_replay_buffer_30000_steps.pkl")
+
+
+def test_save_freq_counts_environment_steps(tmp_path):
+    callback = AsyncCheckpointCallback(save_freq=1000, save_path=tmp_path)
+    callback.training_env = SimpleNamespace(num_envs=4)
+    callback._init_callback()
+    assert callback._save_calls == 250
+    callback._writer.shutdown()
@@ -0,0 +1,117 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+from nett.utils.job import Job
+from nett.utils.port_allocator import PortAllocator
+from nett.utils.scheduler import CpuProbe, Scheduler
+
+GB = 1024 ** 3
+
+MEMINFO = """MemTotal:       16777216 kB
+MemFree:         1048576 kB
+MemAvailable:   12582912 kB
+Buffers:          262144 kB
+Cached:          8388608 kB
+"""
+
+
+@pytest.fixture
+def probe(tmp_path, monkeypatch):
+    meminfo = tmp_path.joinpath("meminfo")
+    meminfo.write_text(MEMINFO)
+    monkeypatch.setattr(CpuProbe, "MEMINFO_PATH", str(meminfo))
+    monkeypatch.setattr("os.sched_getaffinity", lambda pid: set(range(8)))
+    probe = CpuProbe()
+    # the test process itself is not a job
+    probe.own_usage = lambda device: 0
+    return probe
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    Job.initialize(
+        mode="train",
+        output_dir=tmp_path,
+        steps_per_episode=10,
+        save_checkpoints=False,
+        checkpoint_freq=10,
+        reward="supervised",
+        batch_mode=True,
+        iterations={"train": 10},
+        device_type="cpu",
+        num_threads=4)
+    return [Job(brain_id, "condition", -1, brain_id, 0) for brain_id in range(3)]
+
+
+def test_reads_host_memory(probe):
+    status = probe.memory(0)
+    assert status.total == 16 * GB
+    # available memory, not just free memory, counts as free
+    assert status.free == 12 * GB
+    assert status.used == 4 * GB
+
+
+def test_slots_partition_the_cores(probe, monkeypatch):
+    assert probe.num_cores == 8
+    assert probe.device_count() == 8 // CpuProbe.THREADS_PER_SLOT
+    assert probe.threads_per_slot == CpuProbe.THREADS_PER_SLOT
+
+    # more slots than cores still leaves every slot a thread
+    assert CpuProbe(num_slots=4).threads_per_slot == 2
+    assert CpuProbe(num_slots=16).threads_per_slot == 1
+
+    monkeypatch.setattr("os.sched_getaffinity", lambda pid: {0})
+    assert CpuProbe().device_count() == 1
+
+
+def test_slots_share_the_host_pool(tmp_path, probe, jobs):
+    assert probe.max_jobs_per_device == 1
+    assert {probe.pool(device) for device in range(probe.device_count())} == {"host"}
+
+    scheduler = Scheduler([0, 1], 4 * GB, probe, base_port=46000, poll_interval=0.01)
+    scheduler.ports = PortAllocator(46000, registry_path=tmp_path.joinpath("ports.json"))
+    assert scheduler.reserved == {"host": 0}
+    # a reservation on one slot takes memory from every slot
+    scheduler.reserved["host"] = 10 * GB
+    assert scheduler.headroom(0) == scheduler.headroom(1) == 2 * GB
+
+
+def test_one_job_per_slot(tmp_path, probe, jobs):
+    scheduler = Scheduler([0, 1], 1 * GB, probe, base_port=46000, poll_interval=0.01)
+    scheduler.ports = PortAllocator(46000, registry_path=tmp_path.joinpath("ports.json"))
+    release = threading.Event()
+    started = threading.Semaphore(0)
+
+    def fn(job: Job) -> int:
+        started.release()
+        release.wait(10)
+        return job.device
+
+    with ThreadPoolExecutor() as executor:
+        scheduler.submit(jobs)
+        job_sheet = scheduler.launch(executor, fn, wait=False)
+        assert started.acquire(timeout=5) and started.acquire(timeout=5)
+        # memory would fit all three jobs, the slots do not
+        assert scheduler.queue_depth == 1
+        assert sorted(job.device for job in scheduler.running.values()) == [0, 1]
+        release.set()
+        scheduler.join()
+
+    # the queued job takes whichever slot frees up first
+    devices = [future.result() for future in job_sheet]
+    assert len(devices) == 3 and set(devices) == {0, 1}
+    assert scheduler.reserved == {"host": 0}
+
+
+def test_cpu_jobs_use_their_share_of_the_cores(monkeypatch):
+    torch = pytest.importorskip("torch")
+    builder = pytest.importorskip("nett.brain.builder")
+    calls = []
+    monkeypatch.setattr(torch, "set_num_threads", calls.append)
+
+    builder.Brain._set_num_threads(SimpleNamespace(device_type="cpu", num_threads=4))
+    builder.Brain._set_num_threads(SimpleNamespace(device_type="cuda", num_threads=None))
+    assert calls == [4]
@@ -0,0 +1,77 @@
+import os
+
+import pandas as pd
+import pytest
+
+import nett.utils.dataset as dataset
+from nett.utils.dataset import EPISODE_COLUMNS, LogDataset
+
+HEADER = ", ".join(EPISODE_COLUMNS + ["Step", "agent.x"])
+
+
+def steps(episode: int, xs: list[float]) -> str:
+    # one line per step of an episode with the agent at each of the given positions
+    return "".join(f"{episode}, L, R, L, train, cond, cond, {step}, {x}\n" for step, x in enumerate(xs))
+
+
+@pytest.fixture
+def run_dir(tmp_path):
+    path = tmp_path.joinpath("run", "object1", "brain_1", "env_logs", "fork_side-agent1_train.csv")
+    path.parent.mkdir(parents=True)
+    path.write_text(HEADER + "\n" + steps(0, [-9.0, 0.0, 9.0]))
+    return tmp_path.joinpath("run")
+
+
+@pytest.fixture
+def merges(monkeypatch):
+    # the files merged by each call, a single file is merged without a process pool
+    calls = []
+    merge_file = dataset._merge_file
+
+    def spy(path, *args):
+        calls.append(path.name)
+        return merge_file(path, *args)
+
+    monkeypatch.setattr(dataset, "_merge_file", spy)
+    return calls
+
+
+def test_unchanged_logs_are_not_merged_again(tmp_path, run_dir, merges):
+    logs = LogDataset(tmp_path.joinpath("dataset"))
+    assert logs.merge(run_dir) == {"train": 1, "test": 0}
+    assert merges == ["fork_side-agent1_train.csv"]
+
+    assert logs.merge(run_dir) == {"train": 1, "test": 0}
+    assert merges == ["fork_side-agent1_train.csv"]
+
+    data = logs.load("train")
+    assert data[["left_steps", "middle_steps", "right_steps"]].values.tolist() == [[1, 1, 1]]
+    assert data[["condition", "brain_id", "agent"]].values.tolist() == [["object1", 1, 1]]
+
+
+def test_changed_logs_are_merged_again(tmp_path, run_dir, merges):
+    logs = LogDataset(tmp_path.joinpath("dataset"))
+    logs.merge(run_dir)
+
+    path = run_dir.joinpath("object1", "brain_1", "env_logs", "fork_side-agent1_train.csv")
+    with open(path, "a") as file:
+        file.write(steps(1, [9.0, 9.0]))
+    logs.merge(run_dir)
+    assert merges == ["fork_side-agent1_train.csv"] * 2
+    assert logs.load("train")["Episode"].tolist() == [0, 1]
+
+    # a touched file counts as changed even if its size is the same
+    stat = path.stat()
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    logs.merge(run_dir)
+    assert merges == ["fork_side-agent1_train.csv"] * 3
+
+
+def test_removed_logs_are_dropped(tmp_path, run_dir):
+    logs = LogDataset(tmp_path.joinpath("dataset"))
+    logs.merge(run_dir)
+    run_dir.joinpath("object1", "brain_1", "env_logs", "fork_side-agent1_train.csv").unlink()
+
+    assert logs.merge(run_dir) == {"train": 0, "test": 0}
+    with pytest.raises(FileNotFoundError):
+        logs.load("train")
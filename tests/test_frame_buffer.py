@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+gym = pytest.importorskip("gym")
+from gym.wrappers import FrameStack
+
+from nett.body.wrappers.frame_buffer import FrameBufferWrapper
+
+
+class CountingEnv(gym.Env):
+    # channel-first frames filled with the number of steps taken, so every frame is different
+
+    observation_space = gym.spaces.Box(low=0, high=255, shape=(3, 4, 5), dtype=np.uint8)
+    action_space = gym.spaces.Discrete(2)
+
+    def __init__(self) -> None:
+        self.steps = 0
+
+    def _frame(self) -> np.ndarray:
+        frame = np.full(self.observation_space.shape, self.steps % 256, dtype=np.uint8)
+        # a different value per channel catches a wrong transpose
+        return frame + np.arange(3, dtype=np.uint8)[:, None, None]
+
+    def reset(self, **kwargs) -> np.ndarray:
+        self.steps += 100
+        return self._frame()
+
+    def step(self, action):
+        self.steps += 1
+        return self._frame(), 0.0, False, {}
+
+
+@pytest.mark.parametrize("num_stack", [1, 2, 4])
+def test_stack_matches_gym_frame_stack(num_stack):
+    expected_env = FrameStack(CountingEnv(), num_stack)
+    env = FrameBufferWrapper(CountingEnv(), num_stack)
+
+    def check(expected):
+        # FrameStack stacks channel-first frames, the buffer keeps them channel-last
+        assert env.frames.stack.flags.c_contiguous
+        np.testing.assert_array_equal(env.frames.stack.transpose(0, 3, 1, 2), np.asarray(expected))
+        np.testing.assert_array_equal(env.frames.latest.transpose(2, 0, 1), np.asarray(expected)[-1])
+
+    def step():
+        expected = expected_env.step(0)[0]
+        env.step(0)
+        check(expected)
+
+    def reset():
+        expected = expected_env.reset()
+        env.reset()
+        check(expected)
+
+    reset()
+    # more than one trip around the doubled ring, then a reset in the middle of it
+    for _ in range(2 * num_stack + 3):
+        step()
+    reset()
+    for _ in range(2 * num_stack + 1):
+        step()
@@ -0,0 +1,61 @@
+from nett.utils.job import Job
+from nett.utils.ledger import Ledger
+
+
+def make_job(condition: str, brain_id: int, completed_phases=None) -> Job:
+    return Job(brain_id, condition, -1, brain_id, -1, completed_phases=completed_phases)
+
+
+def test_resume_runs_only_the_missing_phases(tmp_path):
+    Job.initialize(
+        mode="full",
+        output_dir=tmp_path,
+        steps_per_episode=10,
+        save_checkpoints=False,
+        checkpoint_freq=10,
+        reward="supervised",
+        batch_mode=True,
+        iterations={"train": 10, "test": 10},
+        resume=True)
+    ledger = Ledger(tmp_path)
+    # trained, then interrupted during test
+    interrupted = make_job("object1", 1)
+    ledger.record(interrupted, "train", "started")
+    ledger.record(interrupted, "train", "completed")
+    ledger.record(interrupted, "test", "started")
+    # finished both phases
+    finished = make_job("object1", 2)
+    for phase in ("train", "test"):
+        ledger.record(finished, phase, "started")
+        ledger.record(finished, phase, "completed")
+    # failed during train
+    failed = make_job("object2", 1)
+    ledger.record(failed, "train", "started")
+    ledger.record(failed, "train", "failed", error="RuntimeError()")
+
+    tasks = {("object1", 1), ("object1", 2), ("object2", 1), ("object2", 2)}
+    remaining = Ledger(tmp_path).remaining(tasks, {"train", "test"})
+    assert remaining == {("object1", 1), ("object2", 1), ("object2", 2)}
+
+    completed = Ledger(tmp_path).completed()
+    assert make_job("object1", 1, completed.get(("object1", 1))).phases == ["test"]
+    assert make_job("object2", 1, completed.get(("object2", 1))).phases == ["train", "test"]
+
+
+def test_skips_malformed_entries(tmp_path):
+    Job.initialize(
+        mode="train",
+        output_dir=tmp_path,
+        steps_per_episode=10,
+        save_checkpoints=False,
+        checkpoint_freq=10,
+        reward="supervised",
+        batch_mode=True,
+        iterations={"train": 10})
+    ledger = Ledger(tmp_path)
+    ledger.record(make_job("object1", 1), "train", "completed")
+    # a crash in the middle of a write
+    with open(ledger.path, "a") as file:
+        file.write('{"time": 1, "condition"')
+
+    assert ledger.completed() == {("object1", 1): {"train"}}
@@ -0,0 +1,40 @@
+from nett.utils.dataset import EPISODE_COLUMNS
+from nett.utils.live_analyzer import LogTail
+
+HEADER = ", ".join(EPISODE_COLUMNS + ["Step", "agent.x"])
+
+
+def step(episode: int, x: float) -> str:
+    return f"{episode}, L, R, L, train, cond, cond, 0, {x}"
+
+
+def test_partial_lines_are_read_once_complete(tmp_path):
+    path = tmp_path.joinpath("fork_side-agent1_train.csv")
+    tail = LogTail(path)
+    assert not tail.update()
+
+    # Unity is in the middle of writing the second step
+    line = step(0, 9.0)
+    path.write_text(HEADER + "\n" + step(0, -9.0) + "\n" + line[:10])
+    assert tail.update()
+    assert tail.episodes[["left_steps", "right_steps"]].values.tolist() == [[1, 0]]
+
+    with open(path, "a") as file:
+        file.write(line[10:] + "\n")
+    assert tail.update()
+    assert tail.episodes[["left_steps", "right_steps"]].values.tolist() == [[1, 1]]
+
+    # nothing new
+    assert not tail.update()
+
+
+def test_header_split_across_reads(tmp_path):
+    path = tmp_path.joinpath("fork_side-agent1_train.csv")
+    tail = LogTail(path)
+    path.write_text(HEADER[:5])
+    assert not tail.update()
+
+    with open(path, "a") as file:
+        file.write(HEADER[5:] + "\n" + step(0, 0.0) + "\n")
+    assert tail.update()
+    assert tail.episodes["middle_steps"].tolist() == [1]
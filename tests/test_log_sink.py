@@ -0,0 +1,8 @@
+from nett.utils.log_sink import LogSink
+
+
+def test_titles_with_dots_keep_their_name(tmp_path):
+    sink = LogSink(tmp_path.joinpath("agent_0.5_train"))
+    sink.write("Episode,Step")
+    sink.close()
+    assert tmp_path.joinpath("agent_0.5_train.csv").read_text() == "Episode,Step\n"
@@ -0,0 +1,62 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from nett.utils.port_allocator import PortAllocator
+
+
+@pytest.fixture
+def registry_path(tmp_path, monkeypatch):
+    # only the registry decides which ports are free
+    monkeypatch.setattr("nett.utils.port_allocator.port_in_use", lambda port: False)
+    return tmp_path.joinpath("ports.json")
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def test_allocators_reserve_contiguous_blocks_that_do_not_overlap(registry_path):
+    first = PortAllocator(47000, registry_path=registry_path)
+    second = PortAllocator(47000, registry_path=registry_path)
+
+    a = first.reserve(4)
+    b = second.reserve(3)
+    assert a == [47000, 47001, 47002, 47003]
+    assert b == [47004, 47005, 47006]
+    assert first.reserved() == {port: os.getpid() for port in a + b}
+
+
+def test_skips_ports_in_use(registry_path, monkeypatch):
+    monkeypatch.setattr("nett.utils.port_allocator.port_in_use", lambda port: port == 47001)
+    # the block starts after the port that is in use
+    assert PortAllocator(47000, registry_path=registry_path).reserve(2) == [47002, 47003]
+
+
+def test_reclaims_ports_of_dead_processes(registry_path):
+    registry_path.write_text(json.dumps({"47000": dead_pid(), "47001": os.getpid()}))
+    allocator = PortAllocator(47000, registry_path=registry_path)
+
+    assert allocator.reserved() == {47001: os.getpid()}
+    assert allocator.reserve(1) == [47000]
+
+
+def test_releases_ports(registry_path):
+    allocator = PortAllocator(47000, registry_path=registry_path)
+    ports = allocator.reserve(2)
+    allocator.release(ports)
+
+    assert allocator.reserved() == {}
+    assert allocator.reserve(2) == ports
+
+
+def test_runs_out_of_ports(registry_path):
+    allocator = PortAllocator(47000, max_port=47002, registry_path=registry_path)
+    allocator.reserve(2)
+    with pytest.raises(RuntimeError, match="No block of 2 free ports"):
+        allocator.reserve(2)
@@ -0,0 +1,20 @@
+import pytest
+
+from nett.brain import SB3_ALGORITHMS, SB3_CONTRIB_ALGORITHMS, algorithms
+
+
+def test_algorithms_match_the_installed_packages():
+    stable_baselines3 = pytest.importorskip("stable_baselines3")
+    sb3_contrib = pytest.importorskip("sb3_contrib")
+    assert list(SB3_ALGORITHMS) == [name for name in dir(stable_baselines3) if name[0].isupper()]
+    assert list(SB3_CONTRIB_ALGORITHMS) == [name for name in dir(sb3_contrib) if name[0].isupper()]
+
+
+def test_her_replay_buffer_is_listed():
+    assert "HerReplayBuffer" in algorithms
+
+
+def test_encoders_are_resolved_from_one_registry():
+    from nett.brain import ENCODERS, encoders, list_encoders
+    assert list_encoders() == list(ENCODERS)
+    assert sorted(encoders.__all__) == sorted(ENCODERS.values())
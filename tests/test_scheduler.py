@@ -0,0 +1,212 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import pytest
+
+from nett.utils.job import Job
+from nett.utils.port_allocator import PortAllocator
+from nett.utils.scheduler import MemoryStatus, Scheduler
+
+GB = 1024 ** 3
+
+
+class FakeProbe:
+    # devices with a fixed total, memory used by other processes and memory used by the scheduler's jobs
+
+    max_jobs_per_device: Optional[int] = None
+
+    def __init__(self, totals: dict[int, int], outside: Optional[dict[int, int]] = None) -> None:
+        self.totals = totals
+        self.outside = outside or {device: 0 for device in totals}
+        self.own: dict[int, Optional[int]] = {device: 0 for device in totals}
+
+    def device_count(self) -> int:
+        return len(self.totals)
+
+    def memory(self, device: int) -> MemoryStatus:
+        used = self.outside[device] + (self.own[device] or 0)
+        return MemoryStatus(free=self.totals[device] - used, used=used, total=self.totals[device])
+
+    def own_usage(self, device: int) -> Optional[int]:
+        return self.own[device]
+
+    def pool(self, device: int) -> int:
+        return device
+
+
+class BlockingJobs:
+    # a job function that runs until the test releases the job
+
+    def __init__(self) -> None:
+        self.events: dict[int, threading.Event] = {}
+        self.started: dict[int, threading.Event] = {}
+
+    def add(self, brain_id: int) -> None:
+        self.events[brain_id] = threading.Event()
+        self.started[brain_id] = threading.Event()
+
+    def __call__(self, job: Job) -> str:
+        self.started[job.brain_id].set()
+        if not self.events[job.brain_id].wait(10):
+            raise TimeoutError(f"job {job.brain_id} was never released")
+        return f"done {job.brain_id}"
+
+    def release(self, brain_id: int) -> None:
+        self.events[brain_id].set()
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    Job.initialize(
+        mode="train",
+        output_dir=tmp_path,
+        steps_per_episode=10,
+        save_checkpoints=False,
+        checkpoint_freq=10,
+        reward="supervised",
+        batch_mode=True,
+        iterations={"train": 10})
+    return [Job(brain_id, "condition", -1, brain_id, 0) for brain_id in range(4)]
+
+
+def make_scheduler(tmp_path, probe: FakeProbe, job_memory: int = 4 * GB) -> Scheduler:
+    scheduler = Scheduler(sorted(probe.totals), job_memory, probe, base_port=45000, poll_interval=0.01)
+    # keep the test's ports out of the node-wide registry
+    scheduler.ports = PortAllocator(45000, registry_path=tmp_path.joinpath("ports.json"))
+    return scheduler
+
+
+def test_best_fit_picks_the_tightest_device(tmp_path, jobs):
+    probe = FakeProbe({0: 16 * GB, 1: 8 * GB, 2: 6 * GB}, outside={0: 0, 1: 0, 2: 3 * GB})
+    scheduler = make_scheduler(tmp_path, probe)
+    # device 2 has 3 GB left, too little for a job; device 1 is the tightest that fits
+    assert scheduler._place() == 1
+
+    fn = BlockingJobs()
+    fn.add(0)
+    with ThreadPoolExecutor() as executor:
+        scheduler.submit(jobs[:1])
+        job_sheet = scheduler.launch(executor, fn, wait=False)
+        scheduler.join()
+        assert [job.device for job in job_sheet.values()] == [1]
+        fn.release(0)
+
+
+def test_backfills_when_a_job_completes(tmp_path, jobs):
+    probe = FakeProbe({0: 6 * GB})
+    scheduler = make_scheduler(tmp_path, probe)
+    fn = BlockingJobs()
+    for job in jobs[:2]:
+        fn.add(job.brain_id)
+
+    with ThreadPoolExecutor() as executor:
+        scheduler.submit(jobs[:2])
+        job_sheet = scheduler.launch(executor, fn, wait=False)
+        assert fn.started[0].wait(5)
+        # only one job fits, the second one waits for the first to finish
+        assert scheduler.queue_depth == 1
+        assert not fn.started[1].is_set()
+
+        fn.release(0)
+        assert fn.started[1].wait(5)
+        scheduler.join()
+        assert scheduler.queue_depth == 0
+        fn.release(1)
+
+    assert sorted(future.result() for future in job_sheet) == ["done 0", "done 1"]
+    assert scheduler.finished
+    assert scheduler.reserved == {0: 0}
+
+
+def test_queue_depth_and_utilization(tmp_path, jobs):
+    probe = FakeProbe({0: 10 * GB, 1: 10 * GB}, outside={0: 1 * GB, 1: 2 * GB})
+    scheduler = make_scheduler(tmp_path, probe)
+    scheduler.submit(jobs)
+    assert scheduler.queue_depth == 4
+
+    fn = BlockingJobs()
+    for job in jobs:
+        fn.add(job.brain_id)
+    with ThreadPoolExecutor() as executor:
+        scheduler.launch(executor, fn, wait=False)
+        for brain_id in range(4):
+            assert fn.started[brain_id].wait(5)
+        scheduler.join()
+        assert scheduler.queue_depth == 0
+
+        utilization = scheduler.utilization()
+        assert set(utilization) == {0, 1}
+        for device in (0, 1):
+            # two 4 GB jobs fit next to what other processes use on each device
+            assert utilization[device]["jobs"] == 2
+            assert utilization[device]["reserved"] == 8 * GB
+            assert utilization[device]["total"] == 10 * GB
+        assert utilization[1]["used"] == 2 * GB
+        assert utilization[1]["utilization"] == pytest.approx(0.2)
+        for brain_id in range(4):
+            fn.release(brain_id)
+
+
+def test_reclaims_memory_freed_by_other_processes(tmp_path, jobs):
+    probe = FakeProbe({0: 10 * GB}, outside={0: 8 * GB})
+    scheduler = make_scheduler(tmp_path, probe)
+    assert scheduler._place() is None
+
+    # another process exits after the scheduler started
+    probe.outside[0] = 1 * GB
+    assert scheduler._place() == 0
+
+
+def test_counts_jobs_that_outgrow_their_reservation(tmp_path, jobs):
+    probe = FakeProbe({0: 16 * GB})
+    scheduler = make_scheduler(tmp_path, probe)
+    scheduler.reserved[0] = 4 * GB
+    probe.own[0] = 10 * GB
+    assert scheduler.headroom(0) == 6 * GB
+
+
+def test_falls_back_to_the_idle_baseline_without_attribution(tmp_path, jobs):
+    probe = FakeProbe({0: 10 * GB}, outside={0: 2 * GB})
+    probe.own[0] = None
+    scheduler = make_scheduler(tmp_path, probe)
+    assert scheduler.headroom(0) == 8 * GB
+    # nothing of the scheduler runs, so the baseline follows the device
+    probe.outside[0] = 5 * GB
+    assert scheduler.headroom(0) == 5 * GB
+
+
+def test_errors_in_the_background_reach_the_caller(tmp_path, jobs):
+    probe = FakeProbe({0: 6 * GB})
+    scheduler = make_scheduler(tmp_path, probe)
+    fn = BlockingJobs()
+    for job in jobs[:2]:
+        fn.add(job.brain_id)
+
+    with ThreadPoolExecutor() as executor:
+        scheduler.submit(jobs[:2])
+        scheduler.launch(executor, fn, wait=False)
+        assert fn.started[0].wait(5)
+        # another process takes the device, the queued job can never be placed once the first one finishes
+        probe.outside[0] = 6 * GB
+        fn.release(0)
+        with pytest.raises(ValueError, match="could not be scheduled"):
+            scheduler.join()
+
+    assert scheduler.error is not None
+    assert scheduler.finished
+    assert scheduler.queue_depth == 1
+
+
+def test_failed_submits_release_their_reservations(tmp_path, jobs):
+    probe = FakeProbe({0: 6 * GB})
+    scheduler = make_scheduler(tmp_path, probe)
+    executor = ThreadPoolExecutor()
+    executor.shutdown()
+
+    scheduler.submit(jobs[:1])
+    with pytest.raises(RuntimeError):
+        scheduler._dispatch(executor, BlockingJobs())
+    assert scheduler.reserved == {0: 0}
+    assert scheduler.ports.reserved() == {}
+    assert scheduler.queue_depth == 1
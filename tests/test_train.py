@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from nett.utils.train import LearningCurve, compute_train_performance, moving_average
+
+
+def test_moving_average_matches_convolve():
+    values = np.random.default_rng(0).random(50)
+    for window in (1, 7, 50):
+        expected = np.convolve(values, np.ones(window) / window, 'valid')
+        assert np.allclose(moving_average(values, window), expected)
+
+
+def test_moving_average_needs_a_full_window():
+    assert len(moving_average([1.0, 2.0], 3)) == 0
+
+    curve = LearningCurve((3,))
+    for value in (1.0, 2.0):
+        curve.update(value)
+    assert len(curve.curves()[3]) == 0
+
+
+def test_compute_train_performance_is_deprecated(tmp_path):
+    with pytest.deprecated_call():
+        assert compute_train_performance(tmp_path) == ([], [])
+
+
+def test_compute_train_performance_reads_any_csv(tmp_path):
+    # odd episodes are mirrored, so the agent stays with the imprint the whole time
+    log = "Episode,Step,agent.x\n" + "".join(f"{episode},100,{-9 if episode % 2 else 9}\n" for episode in range(3))
+    tmp_path.joinpath("object1_agent1.csv").write_text(log)
+    with pytest.deprecated_call():
+        x, y = compute_train_performance(tmp_path, window=2)
+    assert x == [0, 1]
+    assert list(y) == [1.0, 1.0]